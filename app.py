@@ -1,6 +1,10 @@
 import os
 import json
+import copy
+import time
+import itertools
 import secrets
+import threading
 from datetime import datetime
 from functools import wraps
 
@@ -8,6 +12,11 @@ from flask import Flask, render_template, redirect, url_for, request, session, f
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 
+import change_feed
+import ticket_search
+import ticket_archive
+from data_lock import data_lock, write_atomic
+
 # Initialize Flask app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", secrets.token_hex(16))
@@ -60,6 +69,94 @@ with app.app_context():
         print("Default admin user created: admin / admin")
 
 # Helper functions for JSON data
+# Per-guild cache, only used while the change feed tells us what the bot changed
+_guild_cache = {}  # guild_id -> (cached_at, guild_config)
+# Events can still be dropped, so entries are never trusted for longer than this
+GUILD_CACHE_TTL = float(os.environ.get("GUILD_CACHE_TTL", 30))
+# Bumped on every invalidation, so a read that raced with a change is not cached
+_guild_generation = {}
+_guild_cache_lock = threading.Lock()
+
+def _drop_cached_guild(guild_id):
+    with _guild_cache_lock:
+        _guild_cache.pop(guild_id, None)
+        _guild_generation[guild_id] = _guild_generation.get(guild_id, 0) + 1
+
+def _invalidate_guild(event):
+    """Drop a cached guild when another process reports a change to it"""
+    _drop_cached_guild(event.get('guild'))
+
+change_feed.subscribe(_invalidate_guild)
+change_feed.start()
+
+def _read_guild_config(guild_id):
+    """Read one guild, its panels and its tickets from the JSON files"""
+    guild_file = os.path.join('data/guilds', f"{guild_id}.json")
+    if not os.path.exists(guild_file):
+        return None
+    
+    try:
+        with open(guild_file, 'r', encoding='utf-8') as f:
+            guild_config = json.load(f)
+    except:
+        return None
+        
+    # Get panels
+    panels = {}
+    panels_dir = os.path.join('data/panels', guild_id)
+    if os.path.exists(panels_dir):
+        for panel_file in os.listdir(panels_dir):
+            if panel_file.endswith('.json'):
+                panel_id = panel_file.split('.')[0]
+                try:
+                    with open(os.path.join(panels_dir, panel_file), 'r', encoding='utf-8') as f:
+                        panels[panel_id] = json.load(f)
+                except:
+                    continue
+    
+    # Get tickets
+    tickets = {}
+    tickets_dir = os.path.join('data/tickets', guild_id)
+    if os.path.exists(tickets_dir):
+        for ticket_file in os.listdir(tickets_dir):
+            if ticket_file.endswith('.json'):
+                channel_id = ticket_file.split('.')[0]
+                try:
+                    with open(os.path.join(tickets_dir, ticket_file), 'r', encoding='utf-8') as f:
+                        tickets[channel_id] = json.load(f)
+                except:
+                    continue
+    
+    return {
+        **guild_config,
+        'panels': panels,
+        'tickets': tickets
+    }
+
+def load_guild_config(guild_id):
+    """Load a single guild's configuration, served from cache when possible"""
+    if not change_feed.is_running():
+        # Events may have been missed while the feed was down
+        with _guild_cache_lock:
+            _guild_cache.clear()
+        return _read_guild_config(guild_id)
+    
+    with _guild_cache_lock:
+        entry = _guild_cache.get(guild_id)
+        if entry is not None and time.monotonic() - entry[0] < GUILD_CACHE_TTL:
+            return copy.deepcopy(entry[1])
+        generation = _guild_generation.get(guild_id, 0)
+    
+    guild_config = _read_guild_config(guild_id)
+    
+    # Only cache if nothing changed the guild while it was being read
+    if guild_config is not None:
+        with _guild_cache_lock:
+            if _guild_generation.get(guild_id, 0) == generation:
+                _guild_cache[guild_id] = (time.monotonic(), copy.deepcopy(guild_config))
+    
+    return guild_config
+
 def load_bot_config():
     """Load bot configuration from JSON files"""
     guild_data = {}
@@ -73,46 +170,9 @@ def load_bot_config():
         for filename in os.listdir('data/guilds'):
             if filename.endswith('.json'):
                 guild_id = filename.split('.')[0]
-                guild_file = os.path.join('data/guilds', filename)
-                
-                try:
-                    with open(guild_file, 'r', encoding='utf-8') as f:
-                        guild_config = json.load(f)
-                        
-                    # Get panels
-                    panels = {}
-                    panels_dir = os.path.join('data/panels', guild_id)
-                    if os.path.exists(panels_dir):
-                        for panel_file in os.listdir(panels_dir):
-                            if panel_file.endswith('.json'):
-                                panel_id = panel_file.split('.')[0]
-                                try:
-                                    with open(os.path.join(panels_dir, panel_file), 'r', encoding='utf-8') as f:
-                                        panels[panel_id] = json.load(f)
-                                except:
-                                    continue
-                    
-                    # Get tickets
-                    tickets = {}
-                    tickets_dir = os.path.join('data/tickets', guild_id)
-                    if os.path.exists(tickets_dir):
-                        for ticket_file in os.listdir(tickets_dir):
-                            if ticket_file.endswith('.json'):
-                                channel_id = ticket_file.split('.')[0]
-                                try:
-                                    with open(os.path.join(tickets_dir, ticket_file), 'r', encoding='utf-8') as f:
-                                        tickets[channel_id] = json.load(f)
-                                except:
-                                    continue
-                    
-                    # Add to dict
-                    guild_data[guild_id] = {
-                        **guild_config,
-                        'panels': panels,
-                        'tickets': tickets
-                    }
-                except:
-                    continue
+                guild_config = load_guild_config(guild_id)
+                if guild_config is not None:
+                    guild_data[guild_id] = guild_config
     
     return guild_data
 
@@ -129,26 +189,43 @@ def save_bot_config(config_data):
         panels = guild_data.pop('panels', {})
         tickets = guild_data.pop('tickets', {})
         
-        # Save guild config
-        guild_file = os.path.join('data/guilds', f"{guild_id}.json")
-        with open(guild_file, 'w', encoding='utf-8') as f:
-            json.dump(guild_data, f, indent=2)
+        # Files are replaced atomically and under the shared data lock,
+        # so backups never capture a half-written guild
+        with data_lock():
+            # Save guild config
+            guild_file = os.path.join('data/guilds', f"{guild_id}.json")
+            write_atomic(guild_file, json.dumps(guild_data, indent=2).encode('utf-8'))
+            
+            # Save panels
+            panels_dir = os.path.join('data/panels', guild_id)
+            os.makedirs(panels_dir, exist_ok=True)
+            for panel_id, panel_data in panels.items():
+                panel_file = os.path.join(panels_dir, f"{panel_id}.json")
+                write_atomic(panel_file, json.dumps(panel_data, indent=2).encode('utf-8'))
+            
+            # Save tickets (only the ones that actually changed)
+            tickets_dir = os.path.join('data/tickets', guild_id)
+            os.makedirs(tickets_dir, exist_ok=True)
+            changed_tickets = {}
+            for channel_id, ticket_data in tickets.items():
+                ticket_file = os.path.join(tickets_dir, f"{channel_id}.json")
+                encoded = json.dumps(ticket_data, indent=2).encode('utf-8')
+                try:
+                    with open(ticket_file, 'rb') as f:
+                        if f.read() == encoded:
+                            continue
+                except FileNotFoundError:
+                    pass
+                write_atomic(ticket_file, encoded)
+                changed_tickets[channel_id] = ticket_data
         
-        # Save panels
-        panels_dir = os.path.join('data/panels', guild_id)
-        os.makedirs(panels_dir, exist_ok=True)
-        for panel_id, panel_data in panels.items():
-            panel_file = os.path.join(panels_dir, f"{panel_id}.json")
-            with open(panel_file, 'w', encoding='utf-8') as f:
-                json.dump(panel_data, f, indent=2)
+        # Reindexing unchanged tickets would overwrite newer rows the bot
+        # indexed (status, closed_at, archived) with the dashboard's copy
+        ticket_search.index_tickets(guild_id, changed_tickets)
         
-        # Save tickets
-        tickets_dir = os.path.join('data/tickets', guild_id)
-        os.makedirs(tickets_dir, exist_ok=True)
-        for channel_id, ticket_data in tickets.items():
-            ticket_file = os.path.join(tickets_dir, f"{channel_id}.json")
-            with open(ticket_file, 'w', encoding='utf-8') as f:
-                json.dump(ticket_data, f, indent=2)
+        # Let the bot (and other dashboard workers) know this guild changed
+        _drop_cached_guild(guild_id)
+        change_feed.publish(guild_id, 'config')
 
 # Authentication decorator
 def check_login():
@@ -217,7 +294,7 @@ def guilds():
 @app.route('/guilds/<guild_id>/config')
 @check_login()
 def guild_config(guild_id):
-    guild_data = load_bot_config().get(guild_id, {})
+    guild_data = load_guild_config(guild_id)
     if not guild_data:
         flash('Servidor não encontrado', 'danger')
         return redirect(url_for('guilds'))
@@ -227,12 +304,15 @@ def guild_config(guild_id):
 @app.route('/guilds/<guild_id>/config/update', methods=['POST'])
 @check_login()
 def update_guild_config(guild_id):
-    guild_data = load_bot_config()
+    guild_config = load_guild_config(guild_id)
     
-    if guild_id not in guild_data:
+    if guild_config is None:
         flash('Servidor não encontrado', 'danger')
         return redirect(url_for('guilds'))
     
+    # Only this guild is rewritten
+    guild_data = {guild_id: guild_config}
+    
     # Update basic configuration
     guild_data[guild_id]['ticket_format'] = request.form.get('ticket_format', 'ticket-{number}')
     guild_data[guild_id]['max_tickets_per_user'] = int(request.form.get('max_tickets_per_user', 1))
@@ -255,7 +335,7 @@ def update_guild_config(guild_id):
 @app.route('/guilds/<guild_id>/panels')
 @check_login()
 def guild_panels(guild_id):
-    guild_data = load_bot_config().get(guild_id, {})
+    guild_data = load_guild_config(guild_id)
     if not guild_data:
         flash('Servidor não encontrado', 'danger')
         return redirect(url_for('guilds'))
@@ -266,7 +346,7 @@ def guild_panels(guild_id):
 @app.route('/guilds/<guild_id>/panels/<panel_id>/edit')
 @check_login()
 def edit_panel(guild_id, panel_id):
-    guild_data = load_bot_config().get(guild_id, {})
+    guild_data = load_guild_config(guild_id)
     if not guild_data:
         flash('Servidor não encontrado', 'danger')
         return redirect(url_for('guilds'))
@@ -281,12 +361,15 @@ def edit_panel(guild_id, panel_id):
 @app.route('/guilds/<guild_id>/panels/<panel_id>/update', methods=['POST'])
 @check_login()
 def update_panel(guild_id, panel_id):
-    guild_data = load_bot_config()
+    guild_config = load_guild_config(guild_id)
     
-    if guild_id not in guild_data:
+    if guild_config is None:
         flash('Servidor não encontrado', 'danger')
         return redirect(url_for('guilds'))
     
+    # Only this guild is rewritten
+    guild_data = {guild_id: guild_config}
+    
     panels = guild_data[guild_id].get('panels', {})
     if panel_id not in panels:
         flash('Painel não encontrado', 'danger')
@@ -411,6 +494,101 @@ def delete_admin(admin_id):
     flash('Administrador excluído com sucesso', 'success')
     return redirect(url_for('admins'))
 
+# Ticket history, including tickets moved to the cold archive
+@app.route('/api/guilds/<guild_id>/tickets/history')
+@check_login()
+def ticket_history(guild_id):
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+    
+    # Archived tickets are decoded one segment at a time, newest first
+    archived = itertools.islice(ticket_archive.iter_tickets(guild_id), (page - 1) * per_page, page * per_page)
+    
+    return jsonify({
+        'page': page,
+        'per_page': per_page,
+        'total': ticket_archive.count(guild_id),
+        'tickets': [{'channel_id': channel_id, **ticket} for channel_id, ticket in archived]
+    })
+
+@app.route('/api/guilds/<guild_id>/tickets/number/<int:ticket_number>')
+@check_login()
+def ticket_by_number(guild_id, ticket_number):
+    guild_config = load_guild_config(guild_id) or {}
+    for channel_id, ticket in guild_config.get('tickets', {}).items():
+        if ticket.get('ticket_number') == ticket_number:
+            return jsonify({'channel_id': channel_id, 'archived': False, **ticket})
+    
+    channel_id, ticket = ticket_archive.find_by_number(guild_id, ticket_number)
+    if ticket is None:
+        return jsonify({'error': 'Ticket not found'}), 404
+    
+    return jsonify({'channel_id': channel_id, 'archived': True, **ticket})
+
+# Ticket search
+def _parse_timestamp(value):
+    """Accept a Unix timestamp or an ISO date (YYYY-MM-DD[THH:MM])"""
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    return int(datetime.fromisoformat(value).timestamp())
+
+def _search_tickets(guild_id):
+    """Run a ticket search from the request's query string"""
+    args = request.args
+    page = max(args.get('page', 1, type=int), 1)
+    per_page = min(max(args.get('per_page', 50, type=int), 1), 200)
+    
+    since = _parse_timestamp(args.get('since'))
+    if args.get('days', type=int):
+        since = int(time.time()) - args.get('days', type=int) * 86400
+    
+    filters = {
+        'creator_id': args.get('creator'),
+        'claimed_by': args.get('claimer'),
+        'priority': args.get('priority'),
+        'status': args.get('status'),
+        'panel_id': args.get('panel'),
+        'ticket_number': args.get('number', type=int)
+    }
+    
+    tickets, has_more = ticket_search.search(
+        guild_id,
+        query=args.get('q'),
+        page=page,
+        per_page=per_page,
+        since=since,
+        until=_parse_timestamp(args.get('until')),
+        **filters
+    )
+    
+    return {
+        'page': page,
+        'per_page': per_page,
+        'has_more': has_more,
+        'tickets': tickets
+    }
+
+@app.route('/api/guilds/<guild_id>/tickets/search')
+@check_login()
+def api_ticket_search(guild_id):
+    try:
+        return jsonify(_search_tickets(guild_id))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/guilds/<guild_id>/tickets/search')
+@check_login()
+def ticket_search_page(guild_id):
+    try:
+        results = _search_tickets(guild_id)
+    except ValueError as e:
+        flash(f'Busca inválida: {e}', 'danger')
+        results = {'page': 1, 'per_page': 50, 'has_more': False, 'tickets': []}
+    
+    return render_template('ticket_search.html', guild_id=guild_id, results=results, args=request.args)
+
 # API endpoint to check if a user is banned
 @app.route('/api/check-banned', methods=['POST'])
 def check_banned():
@@ -0,0 +1,348 @@
+"""Backup e restauração de todos os dados do bot
+
+Exporta um instante consistente do diretório de dados em segmentos NDJSON
+(um por servidor, comprimidos por padrão) e restaura em paralelo:
+
+    python backup.py export backups/
+    python backup.py export backups/ --incremental
+    python backup.py restore backups/20261018T120000Z --workers 8
+
+Um backup incremental grava apenas os servidores que mudaram; o manifesto
+aponta, para cada servidor, o backup que contém a sua versão.
+"""
+import os
+import sys
+import gzip
+import json
+import shutil
+import hashlib
+import logging
+import argparse
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import models
+import snapshot
+import ticket_search
+import ticket_archive
+from data_lock import data_lock, write_atomic
+
+# Configuração de logging
+logger = logging.getLogger('backup')
+
+MANIFEST_FILE = 'manifest.json'
+LATEST_FILE = 'LATEST'
+DASHBOARD_DIRS = ('guilds', 'panels', 'tickets')
+
+def _link_tree(source, target):
+    """Cria hard links de todos os arquivos (cópia se não for possível)"""
+    if os.path.isfile(source):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+        return
+
+    for root, _, files in os.walk(source):
+        for filename in files:
+            if filename.endswith('.tmp'):
+                continue
+            path = os.path.join(root, filename)
+            _link_tree(path, os.path.join(target, os.path.relpath(path, source)))
+
+def _freeze(staging_dir):
+    """Congela um instante dos dados sob a trava exclusiva
+
+    Todos os arquivos são substituídos atomicamente pelos escritores, então
+    hard links preservam exatamente o conteúdo deste instante sem copiá-lo.
+    A exceção é o snapshot, que recebe gravações no fim do próprio arquivo:
+    o seu cabeçalho deste instante é retornado para fixar o índice lido.
+    """
+    data_dir = models.DATA_DIR
+    sources = [
+        models.CONFIG_FILE,
+        models.CONFIG_SNAPSHOT_FILE,
+        models.BULK_JOBS_FILE,
+        ticket_archive.ARCHIVE_DIR
+    ] + [os.path.join(data_dir, name) for name in DASHBOARD_DIRS]
+
+    snapshot_path = os.path.join(staging_dir, os.path.relpath(models.CONFIG_SNAPSHOT_FILE, data_dir))
+    with data_lock(exclusive=True):
+        for source in sources:
+            if os.path.exists(source):
+                _link_tree(source, os.path.join(staging_dir, os.path.relpath(source, data_dir)))
+
+        if os.path.exists(snapshot_path):
+            return snapshot.read_header(snapshot_path)
+    return None
+
+class _FrozenStore:
+    """Leitura dos dados congelados, um servidor por vez"""
+
+    def __init__(self, staging_dir, snapshot_header=None):
+        self.dir = staging_dir
+        self.archive_dir = os.path.join(staging_dir, os.path.relpath(ticket_archive.ARCHIVE_DIR, models.DATA_DIR))
+        self.reader = None
+        self.configs = None
+
+        snapshot_path = os.path.join(staging_dir, os.path.basename(models.CONFIG_SNAPSHOT_FILE))
+        if models.STORAGE_FORMAT == 'snapshot' and os.path.exists(snapshot_path):
+            self.reader = snapshot.SnapshotReader(snapshot_path, header=snapshot_header)
+        else:
+            self.configs = models._load_json(os.path.join(staging_dir, os.path.basename(models.CONFIG_FILE)))
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+
+    def _list(self, *parts):
+        path = os.path.join(self.dir, *parts)
+        return sorted(os.listdir(path)) if os.path.isdir(path) else []
+
+    def guild_ids(self):
+        guild_ids = set(self.reader.guild_ids() if self.reader else self.configs)
+        if os.path.isdir(self.archive_dir):
+            # archive_dir já inclui o diretório congelado
+            guild_ids.update(os.listdir(self.archive_dir))
+        guild_ids.update(f.split('.')[0] for f in self._list('guilds') if f.endswith('.json'))
+        return sorted(guild_ids)
+
+    def bot_config(self, guild_id):
+        return self.reader.get(guild_id) if self.reader else self.configs.get(guild_id)
+
+    def _read_json(self, *parts):
+        with open(os.path.join(self.dir, *parts), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def records(self, guild_id):
+        """Gera os registros NDJSON de um servidor"""
+        config = self.bot_config(guild_id)
+        if config is not None:
+            config = dict(config)
+            tickets = config.pop('tickets', {})
+            yield {'kind': 'config', 'data': config}
+            for channel_id, ticket in tickets.items():
+                yield {'kind': 'ticket', 'id': channel_id, 'data': ticket}
+
+        for channel_id, ticket in ticket_archive.iter_tickets(guild_id, newest_first=False, archive_dir=self.archive_dir):
+            yield {'kind': 'archived_ticket', 'id': channel_id, 'data': ticket}
+
+        # Arquivos do painel de administração
+        if os.path.exists(os.path.join(self.dir, 'guilds', f"{guild_id}.json")):
+            yield {'kind': 'dashboard_config', 'data': self._read_json('guilds', f"{guild_id}.json")}
+        for kind, folder in (('dashboard_panel', 'panels'), ('dashboard_ticket', 'tickets')):
+            for filename in self._list(folder, guild_id):
+                if filename.endswith('.json'):
+                    yield {'kind': kind, 'id': filename.split('.')[0], 'data': self._read_json(folder, guild_id, filename)}
+
+def _segment_name(guild_id, compress):
+    return f"{guild_id}.ndjson.gz" if compress else f"{guild_id}.ndjson"
+
+def _open_segment(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def _segment_lines(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False, sort_keys=True) + '\n'
+
+def _hash_segment(records):
+    """Calcula (hash, quantidade) dos registros sem gravar nada"""
+    digest = hashlib.sha256()
+    count = 0
+    for line in _segment_lines(records):
+        digest.update(line.encode('utf-8'))
+        count += 1
+    return digest.hexdigest(), count
+
+def _write_segment(path, records):
+    """Grava os registros linha a linha e retorna (hash, quantidade)"""
+    digest = hashlib.sha256()
+    count = 0
+    with _open_segment(path, 'w') as f:
+        for line in _segment_lines(records):
+            digest.update(line.encode('utf-8'))
+            f.write(line)
+            count += 1
+    return digest.hexdigest(), count
+
+def _load_manifest(backup_dir):
+    with open(os.path.join(backup_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def export(dest, incremental=False, compress=True):
+    """Exporta todos os dados para um novo backup dentro de dest"""
+    name = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S.%fZ')
+    backup_dir = os.path.join(dest, name)
+    os.makedirs(os.path.join(backup_dir, 'guilds'), exist_ok=True)
+
+    previous = None
+    latest_path = os.path.join(dest, LATEST_FILE)
+    if incremental and os.path.exists(latest_path):
+        with open(latest_path, 'r', encoding='utf-8') as f:
+            previous = _load_manifest(os.path.join(dest, f.read().strip()))
+
+    # Os links ficam dentro do diretório de dados para estarem no mesmo disco
+    staging_dir = os.path.join(models.DATA_DIR, f".backup-{os.getpid()}")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+    manifest = {
+        'created_at': name,
+        'base': previous['created_at'] if previous else None,
+        'storage_format': models.STORAGE_FORMAT,
+        'guilds': {}
+    }
+    written = 0
+
+    try:
+        snapshot_header = _freeze(staging_dir)
+        store = _FrozenStore(staging_dir, snapshot_header)
+
+        try:
+            for guild_id in store.guild_ids():
+                old = previous['guilds'].get(guild_id) if previous else None
+                if old is not None:
+                    # Primeiro só calcula o hash: servidores sem alterações
+                    # reaproveitam o segmento anterior sem serializar em disco
+                    digest, count = _hash_segment(store.records(guild_id))
+                    if old['hash'] == digest:
+                        manifest['guilds'][guild_id] = old
+                        continue
+
+                path = os.path.join(backup_dir, 'guilds', _segment_name(guild_id, compress))
+                digest, count = _write_segment(path, store.records(guild_id))
+
+                manifest['guilds'][guild_id] = {
+                    'hash': digest,
+                    'records': count,
+                    'location': name,
+                    'segment': os.path.basename(path)
+                }
+                written += 1
+
+            manifest['bulk_jobs'] = models._load_json(
+                os.path.join(staging_dir, os.path.basename(models.BULK_JOBS_FILE))
+            )
+        finally:
+            store.close()
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    write_atomic(os.path.join(backup_dir, MANIFEST_FILE), json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+    write_atomic(latest_path, name.encode('utf-8'))
+
+    logger.info(f"Backup {name}: {written} de {len(manifest['guilds'])} servidores gravados")
+    return backup_dir, written, len(manifest['guilds'])
+
+def _read_guild_segment(path):
+    """Decodifica o segmento de um servidor"""
+    guild = {'config': None, 'tickets': {}, 'archived': {}, 'dashboard': None, 'panels': {}, 'dashboard_tickets': {}}
+    targets = {
+        'ticket': 'tickets',
+        'archived_ticket': 'archived',
+        'dashboard_panel': 'panels',
+        'dashboard_ticket': 'dashboard_tickets'
+    }
+
+    with _open_segment(path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record['kind'] == 'config':
+                guild['config'] = record['data']
+            elif record['kind'] == 'dashboard_config':
+                guild['dashboard'] = record['data']
+            else:
+                guild[targets[record['kind']]][record['id']] = record['data']
+
+    return guild
+
+def _restore_guild(guild_id, guild):
+    """Recria o arquivo frio e os arquivos do painel de um servidor"""
+    archive_dir = os.path.join(ticket_archive.ARCHIVE_DIR, guild_id)
+    shutil.rmtree(archive_dir, ignore_errors=True)
+    # Reconstrói os segmentos e o índice do arquivo frio
+    ticket_archive.append(guild_id, guild['archived'])
+
+    if guild['dashboard'] is not None:
+        data_dir = models.DATA_DIR
+        os.makedirs(os.path.join(data_dir, 'guilds'), exist_ok=True)
+        write_atomic(os.path.join(data_dir, 'guilds', f"{guild_id}.json"), json.dumps(guild['dashboard'], indent=2).encode('utf-8'))
+
+        for folder, items in (('panels', guild['panels']), ('tickets', guild['dashboard_tickets'])):
+            folder_dir = os.path.join(data_dir, folder, guild_id)
+            os.makedirs(folder_dir, exist_ok=True)
+            for item_id, data in items.items():
+                write_atomic(os.path.join(folder_dir, f"{item_id}.json"), json.dumps(data, indent=2).encode('utf-8'))
+
+def restore(backup_dir, workers=4):
+    """Restaura um backup (o bot e o painel devem estar parados)"""
+    manifest = _load_manifest(backup_dir)
+    dest = os.path.dirname(os.path.abspath(backup_dir))
+
+    def load(item):
+        guild_id, entry = item
+        path = os.path.join(dest, entry['location'], 'guilds', entry['segment'])
+        guild = _read_guild_segment(path)
+        _restore_guild(guild_id, guild)
+        return guild_id, guild
+
+    configs = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for guild_id, guild in executor.map(load, manifest['guilds'].items()):
+            if guild['config'] is not None:
+                configs[guild_id] = {**guild['config'], 'tickets': guild['tickets']}
+
+    # O armazenamento principal é gravado de uma vez, no formato configurado
+    with data_lock():
+        if models.STORAGE_FORMAT == 'snapshot':
+            snapshot.write(models.CONFIG_SNAPSHOT_FILE, {
+                guild_id: snapshot.dumps(config) for guild_id, config in configs.items()
+            })
+        else:
+            write_atomic(models.CONFIG_FILE, json.dumps(configs, ensure_ascii=False, indent=4).encode('utf-8'))
+
+    models._save_json(models.BULK_JOBS_FILE, manifest.get('bulk_jobs', {}))
+    
+    # O índice de busca é derivado dos dados restaurados
+    ticket_search.rebuild()
+
+    logger.info(f"Backup {manifest['created_at']} restaurado: {len(manifest['guilds'])} servidores")
+    return len(manifest['guilds'])
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Backup e restauração dos dados do bot")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help="Exporta um backup consistente")
+    export_parser.add_argument('dest', help="Diretório onde os backups são guardados")
+    export_parser.add_argument('--incremental', action='store_true', help="Grava apenas os servidores alterados desde o último backup")
+    export_parser.add_argument('--no-compress', action='store_true', help="Grava NDJSON sem compressão")
+
+    restore_parser = subparsers.add_parser('restore', help="Restaura um backup")
+    restore_parser.add_argument('backup', help="Diretório do backup a restaurar")
+    restore_parser.add_argument('--workers', type=int, default=4)
+    restore_parser.add_argument('--force', action='store_true', help="Sobrescreve os dados existentes")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        backup_dir, written, total = export(args.dest, incremental=args.incremental, compress=not args.no_compress)
+        print(f"Backup gravado em {backup_dir}: {written} de {total} servidores")
+        return 0
+
+    if models._guild_ids() and not args.force:
+        print("Já existem dados salvos; use --force para sobrescrevê-los")
+        return 1
+
+    count = restore(args.backup, workers=args.workers)
+    print(f"{count} servidores restaurados")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
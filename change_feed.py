@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import queue
+import socket
+import atexit
+import select
+import logging
+import threading
+
+# Configuração de logging
+logger = logging.getLogger('change_feed')
+
+# Diretório com um socket Unix por processo inscrito no feed
+FEED_DIR = os.path.join('data', 'feed')
+# Canal usado com LISTEN/NOTIFY quando DATABASE_URL aponta para o Postgres
+PG_CHANNEL = 'helpybot_changes'
+# Tempo máximo para conectar ao Postgres (em segundos)
+PG_CONNECT_TIMEOUT = 5
+# Eventos aguardando envio ao Postgres; o excedente é descartado
+PG_SEND_QUEUE = 1000
+
+_subscribers = []
+_transport = None
+_transport_lock = threading.Lock()
+_listener = None
+# Marcado quando o listener está de fato inscrito (socket ligado ou LISTEN feito)
+_subscribed = threading.Event()
+
+class UnixSocketTransport:
+    """Entrega eventos entre processos locais via sockets Unix de datagrama
+
+    Cada processo cria ``data/feed/<pid>.sock``; publicar um evento envia o
+    datagrama para todos os outros sockets do diretório.
+    """
+
+    def __init__(self):
+        os.makedirs(FEED_DIR, exist_ok=True)
+        self.path = os.path.join(FEED_DIR, f"{os.getpid()}.sock")
+        self.sock = None
+
+    def _bind(self):
+        if self.sock is not None:
+            return
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path)
+
+    def send(self, payload):
+        data = payload.encode('utf-8')
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        # Um processo parado com a fila cheia não pode travar quem publica
+        sender.setblocking(False)
+        try:
+            for filename in os.listdir(FEED_DIR):
+                path = os.path.join(FEED_DIR, filename)
+                if not filename.endswith('.sock') or path == self.path:
+                    continue
+                try:
+                    sender.sendto(data, path)
+                except BlockingIOError:
+                    logger.warning(f"Fila de {path} cheia, evento descartado")
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Processo encerrado sem remover o seu socket
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+                except OSError as e:
+                    logger.warning(f"Falha ao enviar evento para {path}: {e}")
+        finally:
+            sender.close()
+
+    def listen(self, handler, ready):
+        self._bind()
+        ready()
+        while True:
+            data = self.sock.recv(65536)
+            handler(data.decode('utf-8'))
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+class PostgresTransport:
+    """Entrega eventos via LISTEN/NOTIFY do Postgres
+
+    Os envios passam por uma fila atendida por uma thread própria, para que
+    publicar nunca espere pela rede (nem trave o loop de eventos do bot).
+    """
+
+    def __init__(self, dsn):
+        import psycopg2
+
+        self.dsn = dsn
+        self.psycopg2 = psycopg2
+        self.conn = None
+        self.pending = queue.Queue(maxsize=PG_SEND_QUEUE)
+        self.sender = None
+        self.sender_lock = threading.Lock()
+
+    def connect(self):
+        conn = self.psycopg2.connect(self.dsn, connect_timeout=PG_CONNECT_TIMEOUT)
+        conn.autocommit = True
+        return conn
+
+    def _connection(self):
+        if self.conn is None or self.conn.closed:
+            self.conn = self.connect()
+        return self.conn
+
+    def _send_forever(self):
+        while True:
+            payload = self.pending.get()
+            try:
+                with self._connection().cursor() as cursor:
+                    cursor.execute("SELECT pg_notify(%s, %s)", (PG_CHANNEL, payload))
+            except Exception as e:
+                logger.warning(f"Erro ao enviar evento ao Postgres: {e}")
+                if self.conn is not None:
+                    self.conn.close()
+                    self.conn = None
+
+    def send(self, payload):
+        with self.sender_lock:
+            if self.sender is None:
+                self.sender = threading.Thread(target=self._send_forever, name='change-feed-pg', daemon=True)
+                self.sender.start()
+        try:
+            self.pending.put_nowait(payload)
+        except queue.Full:
+            logger.warning("Fila de envio ao Postgres cheia, evento descartado")
+
+    def listen(self, handler, ready):
+        # Conexão própria: a de envio é usada pela thread de envio
+        conn = self.connect()
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {PG_CHANNEL}")
+        ready()
+
+        while True:
+            if select.select([conn], [], [], 60) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                handler(conn.notifies.pop(0).payload)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+def _get_transport():
+    global _transport
+
+    with _transport_lock:
+        if _transport is None:
+            database_url = os.environ.get('DATABASE_URL', '')
+            if database_url.startswith(('postgres://', 'postgresql://')):
+                try:
+                    _transport = PostgresTransport(database_url)
+                except ImportError:
+                    logger.warning("psycopg2 indisponível, usando sockets Unix para o feed de alterações")
+            if _transport is None:
+                _transport = UnixSocketTransport()
+        return _transport
+
+def publish(guild_id, entity, entity_id=None):
+    """Publica uma alteração para os outros processos
+
+    entity é o tipo do dado alterado ('config', 'panel', 'ticket', ...) e
+    entity_id o seu identificador; None indica que toda a coleção mudou.
+    """
+    event = {
+        'guild': str(guild_id),
+        'entity': entity,
+        'id': str(entity_id) if entity_id is not None else None,
+        'version': time.time_ns(),
+        'pid': os.getpid()
+    }
+
+    try:
+        _get_transport().send(json.dumps(event))
+    except Exception as e:
+        logger.warning(f"Erro ao publicar alteração {event}: {e}")
+
+    return event['version']
+
+def subscribe(callback):
+    """Registra uma função chamada com cada evento recebido de outro processo"""
+    _subscribers.append(callback)
+
+def _dispatch(payload):
+    try:
+        event = json.loads(payload)
+    except ValueError:
+        return
+
+    if event.get('pid') == os.getpid():
+        return
+
+    for callback in list(_subscribers):
+        try:
+            callback(event)
+        except Exception as e:
+            logger.error(f"Erro ao processar alteração {event}: {e}")
+
+def _listen_forever():
+    transport = _get_transport()
+    while True:
+        try:
+            transport.listen(_dispatch, _subscribed.set)
+        except Exception as e:
+            _subscribed.clear()
+            logger.error(f"Feed de alterações interrompido: {e}")
+            time.sleep(5)
+
+def start():
+    """Inicia a thread que recebe as alterações dos outros processos"""
+    global _listener
+
+    if _listener is not None:
+        return
+    _listener = threading.Thread(target=_listen_forever, name='change-feed', daemon=True)
+    _listener.start()
+    atexit.register(_get_transport().close)
+
+def is_running():
+    """Indica se este processo está recebendo as alterações dos outros
+
+    Só é verdadeiro depois que o listener se inscreveu e enquanto ele não
+    falhar. Eventos ainda podem ser descartados (fila cheia), então quem usa
+    cache também deve limitar a sua idade.
+    """
+    return _listener is not None and _listener.is_alive() and _subscribed.is_set()
@@ -0,0 +1,346 @@
+import time
+import asyncio
+import logging
+from typing import Optional
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from models import Ticket, BulkJob
+from interaction_deadline import run_storage
+
+logger = logging.getLogger('ticket_bulk')
+
+# Intervalo mínimo entre chamadas à API do Discord (em segundos)
+BULK_API_DELAY = 0.5
+# Quantidade de canais processados entre gravações de progresso
+BULK_CHECKPOINT = 10
+# Intervalo mínimo entre atualizações da mensagem de progresso (em segundos)
+BULK_PROGRESS_INTERVAL = 5
+
+ACTION_STATUS = {
+    'close': 'closed',
+    'archive': 'archived',
+    'delete': None
+}
+
+ACTION_LABELS = {
+    'close': 'Fechamento',
+    'archive': 'Arquivamento',
+    'delete': 'Exclusão'
+}
+
+# Ações que pedem confirmação antes de serem aplicadas
+CONFIRM_ACTIONS = ('close', 'archive', 'delete')
+
+# O que acontece com os canais em cada ação (mostrado na confirmação)
+ACTION_CHANNEL_EFFECTS = {
+    'close': 'os canais serão excluídos',
+    'archive': 'os canais serão renomeados e ocultados do criador',
+    'delete': 'os canais serão excluídos'
+}
+# Tempo para confirmar a operação (em segundos)
+CONFIRM_TIMEOUT = 60
+
+class BulkConfirmView(discord.ui.View):
+    """Confirmação de uma operação em massa, restrita a quem a solicitou"""
+
+    def __init__(self, user_id):
+        super().__init__(timeout=CONFIRM_TIMEOUT)
+        self.user_id = user_id
+        self.confirmed = False
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        return interaction.user.id == self.user_id
+
+    @discord.ui.button(label="Confirmar", style=discord.ButtonStyle.danger)
+    async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.confirmed = True
+        await interaction.response.edit_message(content="⏳ Aplicando a operação em massa...", view=None)
+        self.stop()
+
+    @discord.ui.button(label="Cancelar", style=discord.ButtonStyle.secondary)
+    async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.edit_message(content="Operação em massa cancelada.", view=None)
+        self.stop()
+
+class TicketBulk(commands.Cog):
+    """Operações em massa sobre os tickets de um servidor"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.queue = asyncio.Queue()
+        self.worker = None
+
+    async def cog_load(self):
+        self.worker = asyncio.create_task(self._run_worker())
+
+    async def cog_unload(self):
+        if self.worker:
+            self.worker.cancel()
+
+    async def _run_worker(self):
+        """Processa os jobs da fila, retomando os que ficaram pendentes"""
+        await self.bot.wait_until_ready()
+
+        for job_id in BulkJob.get_all():
+            logger.info(f"Retomando operação em massa {job_id}")
+            self.queue.put_nowait(job_id)
+
+        while True:
+            job_id = await self.queue.get()
+            try:
+                await self._process_job(job_id)
+            except Exception as e:
+                logger.error(f"Erro ao processar operação em massa {job_id}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _call_api(self, coro_factory):
+        """Executa uma chamada à API respeitando os limites de taxa"""
+        while True:
+            try:
+                await coro_factory()
+                return True
+            except discord.NotFound:
+                # O canal já não existe, nada a fazer
+                return True
+            except discord.RateLimited as e:
+                await asyncio.sleep(e.retry_after)
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    logger.error(f"Erro na API do Discord: {e}")
+                    return False
+                await asyncio.sleep(BULK_API_DELAY * 4)
+            finally:
+                await asyncio.sleep(BULK_API_DELAY)
+
+    async def _apply_to_channel(self, guild, job, channel_id):
+        """Aplica a ação do job a um canal de ticket"""
+        channel = guild.get_channel(int(channel_id))
+        if channel is None:
+            return True
+
+        reason = f"Operação em massa solicitada por {job['requested_by']}"
+
+        if job['action'] in ('close', 'delete'):
+            return await self._call_api(lambda: channel.delete(reason=reason))
+
+        # Arquivamento: renomeia o canal e remove o acesso do criador
+        ticket_info = job.get('tickets', {}).get(channel_id, {})
+        name = f"arquivado-{ticket_info.get('ticket_number', channel_id)}"
+        if not await self._call_api(lambda: channel.edit(name=name, reason=reason)):
+            return False
+
+        creator_id = ticket_info.get('creator_id')
+        member = guild.get_member(int(creator_id)) if creator_id else None
+        if member is not None:
+            return await self._call_api(lambda: channel.set_permissions(member, view_channel=False, reason=reason))
+        return True
+
+    @staticmethod
+    def _apply_to_store(job_id, guild_id, action, channel_ids):
+        """Altera os tickets do job de uma só vez e marca o job como aplicado
+
+        Pode ser repetido sem efeito extra (tickets já alterados são ignorados).
+        """
+        if action == 'delete':
+            changed = Ticket.bulk_delete(guild_id, channel_ids)
+        else:
+            changed = Ticket.bulk_update(guild_id, channel_ids, {'status': ACTION_STATUS[action]})
+
+        BulkJob.update(job_id, {'store_applied': True})
+        return changed
+
+    async def _get_progress_message(self, job):
+        if not job.get('progress_channel_id') or not job.get('progress_message_id'):
+            return None
+
+        channel = self.bot.get_channel(int(job['progress_channel_id']))
+        if channel is None:
+            return None
+        return channel.get_partial_message(int(job['progress_message_id']))
+
+    async def _report_progress(self, job, finished=False):
+        """Atualiza a mensagem de progresso do job"""
+        message = await self._get_progress_message(job)
+        if message is None:
+            return
+
+        processed = job['done'] + job['failed']
+        label = ACTION_LABELS.get(job['action'], job['action'])
+
+        if finished:
+            content = f"✅ {label} em massa concluído: {job['done']} canais processados"
+        else:
+            content = f"⏳ {label} em massa em andamento: {processed}/{job['total']} canais"
+        if job['failed']:
+            content += f" ({job['failed']} falhas)"
+
+        try:
+            await message.edit(content=content)
+        except discord.HTTPException:
+            # A mensagem foi apagada (por exemplo, estava num dos canais excluídos)
+            job['progress_channel_id'] = None
+            job['progress_message_id'] = None
+
+    async def _process_job(self, job_id):
+        job = BulkJob.get(job_id)
+        if job is None:
+            return
+
+        guild = self.bot.get_guild(int(job['guild_id']))
+        if guild is None:
+            logger.warning(f"Servidor {job['guild_id']} indisponível, descartando operação {job_id}")
+            BulkJob.delete(job_id)
+            return
+
+        if not job.get('store_applied'):
+            # O bot caiu entre gravar o job e alterar os tickets
+            await run_storage(self._apply_to_store, job_id, job['guild_id'], job['action'], job['pending'])
+
+        last_report = 0
+        since_checkpoint = 0
+
+        while job['pending']:
+            channel_id = job['pending'][0]
+
+            if await self._apply_to_channel(guild, job, channel_id):
+                job['done'] += 1
+            else:
+                job['failed'] += 1
+            job['pending'].pop(0)
+
+            since_checkpoint += 1
+            if since_checkpoint >= BULK_CHECKPOINT:
+                since_checkpoint = 0
+                BulkJob.update(job_id, {
+                    'pending': job['pending'],
+                    'done': job['done'],
+                    'failed': job['failed']
+                })
+
+            if time.monotonic() - last_report >= BULK_PROGRESS_INTERVAL:
+                last_report = time.monotonic()
+                await self._report_progress(job)
+
+        await self._report_progress(job, finished=True)
+        BulkJob.delete(job_id)
+        logger.info(f"Operação em massa {job_id} concluída: {job['done']} ok, {job['failed']} falhas")
+
+    @app_commands.command(name="tickets-em-massa", description="Fecha, arquiva ou exclui vários tickets de uma vez")
+    @app_commands.describe(
+        acao="O que fazer com os tickets selecionados",
+        status="Filtrar pelo status do ticket (padrão ao fechar: abertos)",
+        painel="Filtrar pelo ID do painel",
+        idade_horas="Selecionar apenas tickets abertos há pelo menos esse número de horas",
+        criador="Filtrar pelo criador do ticket"
+    )
+    @app_commands.choices(
+        acao=[
+            app_commands.Choice(name="Fechar", value="close"),
+            app_commands.Choice(name="Arquivar", value="archive"),
+            app_commands.Choice(name="Excluir", value="delete")
+        ],
+        status=[
+            app_commands.Choice(name="Abertos", value="open"),
+            app_commands.Choice(name="Fechados", value="closed"),
+            app_commands.Choice(name="Arquivados", value="archived")
+        ]
+    )
+    @app_commands.checks.has_permissions(administrator=True)
+    async def bulk_tickets(
+        self,
+        interaction: discord.Interaction,
+        acao: app_commands.Choice[str],
+        status: Optional[app_commands.Choice[str]] = None,
+        painel: Optional[str] = None,
+        idade_horas: Optional[int] = None,
+        criador: Optional[discord.Member] = None
+    ):
+        await interaction.response.defer(ephemeral=True, thinking=True)
+
+        guild_id = str(interaction.guild_id)
+        action = acao.value
+        status_filter = status.value if status else ('open' if action == 'close' else None)
+
+        selected = await run_storage(
+            Ticket.select,
+            guild_id,
+            status=status_filter,
+            panel_id=painel,
+            creator_id=criador.id if criador else None,
+            older_than=idade_horas
+        )
+
+        if not selected:
+            await interaction.followup.send("Nenhum ticket corresponde aos filtros informados.", ephemeral=True)
+            return
+
+        if action in CONFIRM_ACTIONS:
+            # Fechar e excluir apagam os canais e arquivar os oculta: mostra o alcance antes
+            view = BulkConfirmView(interaction.user.id)
+            message = await interaction.followup.send(
+                f"⚠️ {ACTION_LABELS[action]} de {len(selected)} tickets: {ACTION_CHANNEL_EFFECTS[action]}. Deseja continuar?",
+                view=view,
+                ephemeral=True,
+                wait=True
+            )
+            timed_out = await view.wait()
+            if not view.confirmed:
+                if timed_out:
+                    try:
+                        await message.edit(content="Tempo esgotado, operação em massa cancelada.", view=None)
+                    except discord.HTTPException:
+                        pass
+                return
+
+        channel_ids = list(selected.keys())
+
+        # Canal onde o comando foi usado não recebe progresso se for processado
+        progress_message = None
+        if interaction.channel and str(interaction.channel.id) not in selected:
+            try:
+                progress_message = await interaction.channel.send(
+                    f"⏳ {ACTION_LABELS[action]} em massa em andamento: 0/{len(channel_ids)} canais"
+                )
+            except discord.HTTPException:
+                progress_message = None
+
+        # O job é gravado antes de alterar os tickets: se o bot cair no meio,
+        # a operação é retomada com a lista de canais completa
+        job_id = await run_storage(BulkJob.create, guild_id, {
+            'action': action,
+            'pending': channel_ids,
+            'total': len(channel_ids),
+            'tickets': {
+                channel_id: {
+                    'ticket_number': ticket.get('ticket_number'),
+                    'creator_id': ticket.get('creator_id')
+                }
+                for channel_id, ticket in selected.items()
+            },
+            'requested_by': str(interaction.user),
+            'progress_channel_id': str(progress_message.channel.id) if progress_message else None,
+            'progress_message_id': str(progress_message.id) if progress_message else None
+        })
+
+        if job_id is None:
+            await interaction.followup.send("Não foi possível registrar a operação em massa.", ephemeral=True)
+            return
+
+        changed = await run_storage(self._apply_to_store, job_id, guild_id, action, channel_ids)
+        if not changed:
+            await run_storage(BulkJob.delete, job_id)
+            await interaction.followup.send("Não foi possível atualizar os tickets.", ephemeral=True)
+            return
+
+        self.queue.put_nowait(job_id)
+        await interaction.followup.send(
+            f"{len(changed)} tickets atualizados. Os canais serão processados em segundo plano.",
+            ephemeral=True
+        )
+
+async def setup(bot):
+    await bot.add_cog(TicketBulk(bot))
@@ -0,0 +1,62 @@
+import logging
+
+import discord
+from discord import app_commands
+from discord.ext import commands, tasks
+
+from models import Guild, Ticket
+from interaction_deadline import run_storage
+
+logger = logging.getLogger('ticket_cold_storage')
+
+class TicketColdStorage(commands.Cog):
+    """Move periodicamente os tickets fechados antigos para o arquivo frio"""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def cog_load(self):
+        self.archive_loop.start()
+
+    async def cog_unload(self):
+        self.archive_loop.cancel()
+
+    @tasks.loop(hours=1)
+    async def archive_loop(self):
+        for guild in self.bot.guilds:
+            guild_id = str(guild.id)
+            try:
+                guild_config = await run_storage(Guild.get, guild_id)
+                if not guild_config.get('cold_archive_after', 0):
+                    continue
+                # A migração lê e grava arquivos, então roda fora do loop de
+                # eventos; archive_closed segura a trava das configurações,
+                # então não intercala com Ticket.create e afins
+                await run_storage(Ticket.archive_closed, guild_id)
+            except Exception as e:
+                logger.error(f"Erro ao arquivar tickets do servidor {guild_id}: {e}")
+
+    @archive_loop.before_loop
+    async def before_archive_loop(self):
+        await self.bot.wait_until_ready()
+
+    @app_commands.command(name="arquivo-frio", description="Define após quantas horas os tickets fechados vão para o arquivo")
+    @app_commands.describe(horas="Horas após o fechamento (0 desativa o arquivamento)")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def cold_archive_settings(self, interaction: discord.Interaction, horas: app_commands.Range[int, 0, 24 * 365]):
+        guild_id = str(interaction.guild_id)
+
+        if not await run_storage(Guild.update, guild_id, {'cold_archive_after': horas}):
+            await interaction.response.send_message("Não foi possível salvar a configuração.", ephemeral=True)
+            return
+
+        if horas:
+            await interaction.response.send_message(
+                f"Tickets fechados há mais de {horas} horas serão movidos para o arquivo.",
+                ephemeral=True
+            )
+        else:
+            await interaction.response.send_message("Arquivamento de tickets desativado.", ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(TicketColdStorage(bot))
@@ -0,0 +1,267 @@
+import math
+import time
+import asyncio
+import logging
+from collections import defaultdict, deque
+
+from typing import Optional
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from models import Guild, Panel
+from interaction_deadline import run_storage
+
+logger = logging.getLogger('ticket_pool')
+
+# Nome dos canais reservados enquanto aguardam um ticket
+POOL_CHANNEL_NAME = "ticket-reserva"
+# Intervalo entre verificações do pool (em segundos)
+POOL_REFILL_INTERVAL = 30
+# Janela usada para medir a taxa de abertura de tickets (em segundos)
+POOL_RATE_WINDOW = 10 * 60
+# Quantos minutos de aberturas o pool deve conseguir absorver
+POOL_LEAD_MINUTES = 2
+# Intervalo mínimo entre criações de canais do pool (em segundos)
+POOL_CREATE_DELAY = 1
+
+class TicketPool(commands.Cog):
+    """Pool de canais de ticket pré-criados e ocultos, por categoria
+
+    Ao abrir um ticket, o fluxo de abertura chama ``claim_channel`` para pegar
+    um canal já existente e apenas aplicar nome e permissões, evitando a
+    criação de canal (e o seu limite de taxa) no caminho crítico. O pool é
+    reabastecido em segundo plano e o seu tamanho acompanha a taxa de
+    abertura observada em cada categoria. O pool é ativado por servidor com
+    o comando ``/pool-canais``.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.opens = defaultdict(deque)  # (guild_id, category_id) -> timestamps
+        self.lock = asyncio.Lock()
+        self.refill_task = None
+
+    async def cog_load(self):
+        self.refill_task = asyncio.create_task(self._refill_loop())
+
+    async def cog_unload(self):
+        if self.refill_task:
+            self.refill_task.cancel()
+
+    def _record_open(self, guild_id, category_id):
+        timestamps = self.opens[(guild_id, category_id)]
+        now = time.monotonic()
+        timestamps.append(now)
+        while timestamps and now - timestamps[0] > POOL_RATE_WINDOW:
+            timestamps.popleft()
+
+    def target_size(self, guild_config, guild_id, category_id):
+        """Calcula o tamanho desejado do pool a partir da taxa de abertura"""
+        minimum = guild_config.get('channel_pool_min', 1)
+        maximum = guild_config.get('channel_pool_max', 10)
+
+        timestamps = self.opens.get((guild_id, category_id), ())
+        now = time.monotonic()
+        recent = sum(1 for t in timestamps if now - t <= POOL_RATE_WINDOW)
+        per_minute = recent / (POOL_RATE_WINDOW / 60)
+
+        return max(minimum, min(maximum, math.ceil(per_minute * POOL_LEAD_MINUTES)))
+
+    def _hidden_overwrites(self, guild):
+        return {
+            guild.default_role: discord.PermissionOverwrite(view_channel=False),
+            guild.me: discord.PermissionOverwrite(view_channel=True, manage_channels=True, send_messages=True)
+        }
+
+    async def claim_channel(self, guild, category, name, overwrites, topic=None):
+        """Retira um canal do pool e o prepara para o ticket
+
+        Retorna None se o pool estiver desativado ou vazio; nesse caso o
+        chamador deve criar o canal normalmente.
+        """
+        guild_id = str(guild.id)
+        category_id = str(category.id)
+        self._record_open(guild_id, category_id)
+
+        async with self.lock:
+            # Lido sob a trava: aberturas simultâneas não pegam o mesmo canal
+            guild_config = await run_storage(Guild.get, guild_id)
+            if not guild_config.get('channel_pool_enabled', False):
+                return None
+
+            pool = guild_config.get('channel_pool', {})
+            channel_ids = pool.get(category_id, [])
+
+            channel = None
+            while channel_ids and channel is None:
+                channel = guild.get_channel(int(channel_ids.pop(0)))
+
+            pool[category_id] = channel_ids
+            await run_storage(Guild.update, guild_id, {'channel_pool': pool})
+
+        if channel is None:
+            return None
+
+        try:
+            await channel.edit(name=name, overwrites=overwrites, topic=topic, reason="Ticket aberto")
+        except discord.HTTPException as e:
+            logger.error(f"Erro ao preparar canal do pool {channel.id}: {e}")
+            # O canal continua oculto: devolve ao pool para não ficar órfão
+            await self._return_channel(guild_id, category_id, channel)
+            return None
+
+        return channel
+
+    async def _return_channel(self, guild_id, category_id, channel):
+        """Devolve ao início do pool um canal retirado que não pôde ser usado"""
+        async with self.lock:
+            pool = (await run_storage(Guild.get, guild_id)).get('channel_pool', {})
+            channel_ids = pool.get(category_id, [])
+            if str(channel.id) not in channel_ids:
+                channel_ids.insert(0, str(channel.id))
+            pool[category_id] = channel_ids
+            await run_storage(Guild.update, guild_id, {'channel_pool': pool})
+
+    async def _refill_loop(self):
+        await self.bot.wait_until_ready()
+
+        while True:
+            for guild in self.bot.guilds:
+                try:
+                    await self.refill_guild(guild)
+                except Exception as e:
+                    logger.error(f"Erro ao reabastecer o pool do servidor {guild.id}: {e}")
+            await asyncio.sleep(POOL_REFILL_INTERVAL)
+
+    async def refill_guild(self, guild):
+        """Ajusta o pool de cada categoria de painel ao tamanho desejado"""
+        guild_id = str(guild.id)
+        guild_config = await run_storage(Guild.get, guild_id)
+        if not guild_config.get('channel_pool_enabled', False):
+            return
+
+        panels = await run_storage(Panel.get_all, guild_id)
+        category_ids = {
+            str(panel['category_id'])
+            for panel in panels.values()
+            if panel.get('category_id')
+        }
+
+        for category_id in category_ids:
+            category = guild.get_channel(int(category_id))
+            if not isinstance(category, discord.CategoryChannel):
+                continue
+
+            target = self.target_size(guild_config, guild_id, category_id)
+
+            async with self.lock:
+                pool = (await run_storage(Guild.get, guild_id)).get('channel_pool', {})
+                # Descarta canais do pool que foram apagados manualmente
+                channel_ids = [c for c in pool.get(category_id, []) if guild.get_channel(int(c))]
+                missing = target - len(channel_ids)
+
+            created = []
+            for _ in range(max(0, missing)):
+                try:
+                    channel = await category.create_text_channel(
+                        POOL_CHANNEL_NAME,
+                        overwrites=self._hidden_overwrites(guild),
+                        reason="Reabastecimento do pool de tickets"
+                    )
+                except discord.HTTPException as e:
+                    logger.error(f"Erro ao criar canal do pool na categoria {category_id}: {e}")
+                    break
+                created.append(str(channel.id))
+                await asyncio.sleep(POOL_CREATE_DELAY)
+
+            surplus = []
+            async with self.lock:
+                guild_config = await run_storage(Guild.get, guild_id)
+                if not guild_config.get('channel_pool_enabled', False):
+                    # O pool foi desativado durante a criação: nada é guardado
+                    surplus = created
+                else:
+                    pool = guild_config.get('channel_pool', {})
+                    channel_ids = [c for c in pool.get(category_id, []) if guild.get_channel(int(c))] + created
+                    # Reduz o pool aos poucos quando a demanda cai
+                    if len(channel_ids) > target:
+                        surplus = channel_ids[target:]
+                        channel_ids = channel_ids[:target]
+                    pool[category_id] = channel_ids
+                    await run_storage(Guild.update, guild_id, {'channel_pool': pool})
+
+            await self._delete_channels(guild, surplus, "Redução do pool de tickets")
+
+            if not guild_config.get('channel_pool_enabled', False):
+                return
+
+    async def _delete_channels(self, guild, channel_ids, reason):
+        for channel_id in channel_ids:
+            channel = guild.get_channel(int(channel_id))
+            if channel is None:
+                continue
+            try:
+                await channel.delete(reason=reason)
+            except discord.HTTPException:
+                pass
+            await asyncio.sleep(POOL_CREATE_DELAY)
+
+    @app_commands.command(name="pool-canais", description="Ativa ou desativa o pool de canais de ticket pré-criados")
+    @app_commands.describe(
+        ativar="Manter canais ocultos prontos para novos tickets",
+        minimo="Quantidade mínima de canais reservados por categoria",
+        maximo="Quantidade máxima de canais reservados por categoria"
+    )
+    @app_commands.checks.has_permissions(administrator=True)
+    async def pool_settings(
+        self,
+        interaction: discord.Interaction,
+        ativar: bool,
+        minimo: Optional[app_commands.Range[int, 0, 50]] = None,
+        maximo: Optional[app_commands.Range[int, 1, 50]] = None
+    ):
+        guild_id = str(interaction.guild_id)
+        guild_config = await run_storage(Guild.get, guild_id)
+
+        minimum = minimo if minimo is not None else guild_config.get('channel_pool_min', 1)
+        maximum = maximo if maximo is not None else guild_config.get('channel_pool_max', 10)
+        if minimum > maximum:
+            await interaction.response.send_message("O mínimo não pode ser maior que o máximo.", ephemeral=True)
+            return
+
+        updated = await run_storage(Guild.update, guild_id, {
+            'channel_pool_enabled': ativar,
+            'channel_pool_min': minimum,
+            'channel_pool_max': maximum
+        })
+        if not updated:
+            await interaction.response.send_message("Não foi possível salvar a configuração.", ephemeral=True)
+            return
+
+        if ativar:
+            await interaction.response.send_message(
+                f"Pool de canais ativado ({minimum} a {maximum} canais por categoria).",
+                ephemeral=True
+            )
+            return
+
+        await interaction.response.send_message(
+            "Pool de canais desativado. Os canais reservados serão removidos.",
+            ephemeral=True
+        )
+        await self.drain_guild(interaction.guild)
+
+    async def drain_guild(self, guild):
+        """Apaga os canais reservados de um servidor com o pool desativado"""
+        guild_id = str(guild.id)
+        async with self.lock:
+            pool = (await run_storage(Guild.get, guild_id)).get('channel_pool', {})
+            await run_storage(Guild.update, guild_id, {'channel_pool': {}})
+
+        for channel_ids in pool.values():
+            await self._delete_channels(guild, channel_ids, "Pool de tickets desativado")
+
+async def setup(bot):
+    await bot.add_cog(TicketPool(bot))
@@ -0,0 +1,42 @@
+import os
+import logging
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Configuração de logging
+logger = logging.getLogger('data_lock')
+
+LOCK_FILE = os.path.join('data', '.write.lock')
+
+@contextmanager
+def data_lock(exclusive=False):
+    """Trava entre processos sobre o diretório de dados
+
+    Escritas (bot e painel) usam a trava compartilhada e podem acontecer em
+    paralelo; o backup usa a exclusiva para congelar um instante consistente.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    os.makedirs(os.path.dirname(LOCK_FILE), exist_ok=True)
+    with open(LOCK_FILE, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def write_atomic(file_path, data):
+    """Grava bytes em um arquivo temporário e o substitui de uma vez
+
+    Leitores (e o backup) nunca veem um arquivo pela metade.
+    """
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, file_path)
@@ -0,0 +1,349 @@
+"""Controle do prazo de resposta das interações
+
+O Discord exige que toda interação seja confirmada em até 3 segundos. Este
+módulo acompanha o prazo de cada interação (comandos, botões, menus e
+modais) e, quando o trabalho previsto não cabe no orçamento, confirma a
+interação com ``defer`` automaticamente. As respostas enviadas depois disso
+pelos handlers viram follow-ups sem que eles precisem saber; o defer segue a
+visibilidade (privada ou não) das respostas do handler, e handlers que
+respondem com modal nunca são confirmados automaticamente. O trabalho de
+armazenamento roda em um pool de threads limitado (``run_storage``) para
+não travar o loop de eventos. As taxas de defer e de interações vencidas
+são registradas no log periodicamente (veja ``stats()``).
+
+Uso: ``interaction_deadline.install(bot)`` logo após criar o bot.
+"""
+import os
+import time
+import asyncio
+import logging
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import discord
+from discord.ext import tasks
+
+# Configuração de logging
+logger = logging.getLogger('interaction_deadline')
+
+# Prazo do Discord para confirmar a interação (em segundos)
+ACK_DEADLINE = 3.0
+# A partir deste tempo sem resposta, a interação é confirmada com defer
+DEFER_BUDGET = float(os.getenv('INTERACTION_DEFER_BUDGET', 2.0))
+# Peso da última medição na média móvel do tempo de resposta
+EWMA_ALPHA = 0.2
+# Threads para o trabalho de armazenamento
+STORAGE_WORKERS = int(os.getenv('STORAGE_WORKERS', 4))
+# Tempo de vida do token da interação (follow-ups ainda são aceitos)
+TOKEN_LIFETIME = 15 * 60
+# Códigos de erro do Discord para interações vencidas ou já respondidas
+UNKNOWN_INTERACTION = 10062
+ALREADY_ACKNOWLEDGED = 40060
+# Intervalo entre os registros das estatísticas no log (em segundos)
+STATS_LOG_INTERVAL = float(os.getenv('INTERACTION_STATS_INTERVAL', 600))
+
+_executor = ThreadPoolExecutor(max_workers=STORAGE_WORKERS, thread_name_prefix='storage')
+_states = {}
+_estimates = {}
+# Se cada handler responde de forma privada (o defer automático segue o mesmo)
+_ephemeral = {}
+# Handlers que respondem com modal: modais não podem vir depois de um defer
+_modal_keys = set()
+
+_stats = {
+    'interactions': 0,
+    'acked_in_time': 0,
+    'acked_late': 0,
+    'deferred_predicted': 0,
+    'deferred_watchdog': 0,
+    'redirected_to_followup': 0,
+    'modal_after_defer': 0,
+    'expired': 0
+}
+
+class _State:
+    """Situação de uma interação enquanto o seu prazo é acompanhado"""
+
+    __slots__ = ('key', 'lock', 'deferred', 'acked_at', 'watchdog')
+
+    def __init__(self, key):
+        self.key = key
+        self.lock = asyncio.Lock()
+        self.deferred = False
+        self.acked_at = None
+        self.watchdog = None
+
+def stats():
+    """Contadores de confirmações, defers automáticos e interações vencidas"""
+    return dict(_stats)
+
+def _rates(current, previous):
+    """Taxas (em relação às interações) entre duas leituras de stats()"""
+    delta = {name: current[name] - previous.get(name, 0) for name in current}
+    total = delta['interactions']
+    if not total:
+        return delta, None
+    return delta, {
+        'deferred': (delta['deferred_predicted'] + delta['deferred_watchdog']) / total,
+        'late': delta['acked_late'] / total,
+        'expired': delta['expired'] / total
+    }
+
+_last_logged = {}
+
+@tasks.loop(seconds=STATS_LOG_INTERVAL)
+async def _log_stats():
+    """Registra no log as taxas de defer e de vencimento do último intervalo"""
+    global _last_logged
+    current = stats()
+    delta, rates = _rates(current, _last_logged)
+    _last_logged = current
+    if rates is None:
+        return
+
+    logger.info(
+        f"{delta['interactions']} interações: "
+        f"{rates['deferred']:.1%} confirmadas automaticamente "
+        f"({delta['deferred_predicted']} previstas, {delta['deferred_watchdog']} pelo vigia), "
+        f"{rates['late']:.1%} confirmadas após o prazo, {rates['expired']:.1%} vencidas"
+    )
+
+async def run_storage(func, *args, **kwargs):
+    """Executa uma função de armazenamento (bloqueante) no pool de threads"""
+    loop = asyncio.get_running_loop()
+    # Mantém as variáveis de contexto (como asyncio.to_thread)
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(context.run, func, *args, **kwargs))
+
+def _key(interaction):
+    """Agrupa as interações pelo handler que vai tratá-las"""
+    if interaction.type == discord.InteractionType.application_command:
+        return f"command:{(interaction.data or {}).get('name')}"
+
+    custom_id = (interaction.data or {}).get('custom_id', '')
+    # IDs como "close_ticket:123" compartilham o mesmo handler
+    return f"{interaction.type.name}:{custom_id.split(':')[0]}"
+
+def _elapsed(interaction):
+    return (discord.utils.utcnow() - interaction.created_at).total_seconds()
+
+def _record_ack(interaction, state):
+    if state is None or state.acked_at is not None:
+        return
+
+    state.acked_at = time.monotonic()
+    elapsed = _elapsed(interaction)
+
+    if elapsed <= ACK_DEADLINE:
+        _stats['acked_in_time'] += 1
+    else:
+        _stats['acked_late'] += 1
+
+    if state.watchdog is not None:
+        state.watchdog.cancel()
+
+    # Defers automáticos não medem o handler, apenas o orçamento
+    if not state.deferred:
+        previous = _estimates.get(state.key)
+        _estimates[state.key] = elapsed if previous is None else (1 - EWMA_ALPHA) * previous + EWMA_ALPHA * elapsed
+
+def _is_expired(error):
+    return isinstance(error, discord.HTTPException) and error.code in (UNKNOWN_INTERACTION, ALREADY_ACKNOWLEDGED)
+
+async def _defer(interaction, reason):
+    """Confirma a interação se o handler ainda não respondeu"""
+    state = _states.get(interaction.id)
+    if state is None:
+        return
+
+    async with state.lock:
+        if interaction.response.is_done():
+            return
+        try:
+            if interaction.type == discord.InteractionType.component:
+                # Botões e menus: confirma sem mostrar "pensando"
+                await _original['defer'](interaction.response)
+            else:
+                # O primeiro follow-up herda a visibilidade do defer, então
+                # usa a do handler (privada enquanto ela não for conhecida)
+                await _original['defer'](
+                    interaction.response,
+                    thinking=True,
+                    ephemeral=_ephemeral.get(state.key, True)
+                )
+        except discord.HTTPException as e:
+            if _is_expired(e):
+                _stats['expired'] += 1
+            logger.warning(f"Não foi possível confirmar a interação {interaction.id} ({state.key}): {e}")
+            return
+
+        state.deferred = True
+        _stats[reason] += 1
+        _record_ack(interaction, state)
+
+    logger.debug(f"Interação {interaction.id} ({state.key}) confirmada automaticamente ({reason})")
+
+_TRACKED_TYPES = (
+    discord.InteractionType.application_command,
+    discord.InteractionType.component,
+    discord.InteractionType.modal_submit
+)
+
+def _track(interaction):
+    """Obtém (ou cria) o estado de uma interação
+
+    O handler pode responder antes do listener on_interaction rodar, então o
+    estado é criado por quem chegar primeiro.
+    """
+    state = _states.get(interaction.id)
+    if state is None and interaction.type in _TRACKED_TYPES:
+        _stats['interactions'] += 1
+        state = _State(_key(interaction))
+        _states[interaction.id] = state
+        asyncio.get_running_loop().call_later(TOKEN_LIFETIME, _states.pop, interaction.id, None)
+    return state
+
+async def _on_interaction(interaction):
+    """Começa a acompanhar o prazo de uma interação recebida"""
+    state = _track(interaction)
+    if state is None or state.acked_at is not None:
+        return
+
+    if state.key in _modal_keys:
+        # Este handler responde com modal: um defer o impediria
+        return
+
+    loop = asyncio.get_running_loop()
+    elapsed = _elapsed(interaction)
+    projected = _estimates.get(state.key, 0.0)
+
+    if elapsed + projected > DEFER_BUDGET:
+        # Pelo histórico deste handler, a resposta não chegaria a tempo
+        await _defer(interaction, 'deferred_predicted')
+        return
+
+    delay = max(0.0, DEFER_BUDGET - elapsed)
+    state.watchdog = loop.call_later(delay, lambda: asyncio.ensure_future(_defer(interaction, 'deferred_watchdog')))
+
+# Métodos originais de InteractionResponse, usados pelas versões com prazo
+_original = {}
+
+def _wrap_response_methods():
+    response_cls = discord.InteractionResponse
+    if _original:
+        return
+
+    for name in ('send_message', 'edit_message', 'defer', 'send_modal'):
+        _original[name] = getattr(response_cls, name)
+
+    @functools.wraps(_original['send_message'])
+    async def send_message(self, *args, **kwargs):
+        interaction = self._parent
+        state = _track(interaction)
+        if state is None:
+            return await _original['send_message'](self, *args, **kwargs)
+
+        _ephemeral[state.key] = kwargs.get('ephemeral', False)
+
+        async with state.lock:
+            if state.deferred:
+                # Já confirmada automaticamente: a resposta vira follow-up
+                _stats['redirected_to_followup'] += 1
+                kwargs.pop('delete_after', None)
+                return await interaction.followup.send(*args, **kwargs)
+            result = await _original['send_message'](self, *args, **kwargs)
+            _record_ack(interaction, state)
+            return result
+
+    @functools.wraps(_original['edit_message'])
+    async def edit_message(self, *args, **kwargs):
+        interaction = self._parent
+        state = _track(interaction)
+        if state is None:
+            return await _original['edit_message'](self, *args, **kwargs)
+
+        async with state.lock:
+            if state.deferred:
+                _stats['redirected_to_followup'] += 1
+                kwargs.pop('delete_after', None)
+                return await interaction.edit_original_response(*args, **kwargs)
+            result = await _original['edit_message'](self, *args, **kwargs)
+            _record_ack(interaction, state)
+            return result
+
+    @functools.wraps(_original['defer'])
+    async def defer(self, *args, **kwargs):
+        interaction = self._parent
+        state = _track(interaction)
+        if state is None:
+            return await _original['defer'](self, *args, **kwargs)
+
+        if kwargs.get('thinking'):
+            _ephemeral[state.key] = kwargs.get('ephemeral', False)
+
+        async with state.lock:
+            if state.deferred:
+                # O handler também pediu defer: o automático já basta
+                return None
+            result = await _original['defer'](self, *args, **kwargs)
+            _record_ack(interaction, state)
+            return result
+
+    @functools.wraps(_original['send_modal'])
+    async def send_modal(self, *args, **kwargs):
+        interaction = self._parent
+        state = _track(interaction)
+        if state is not None:
+            # Interações deste handler não são mais confirmadas automaticamente
+            _modal_keys.add(state.key)
+            if state.watchdog is not None:
+                state.watchdog.cancel()
+            if state.deferred:
+                # Modais não podem ser enviados depois de um defer
+                _stats['modal_after_defer'] += 1
+        result = await _original['send_modal'](self, *args, **kwargs)
+        _record_ack(interaction, state)
+        return result
+
+    response_cls.send_message = send_message
+    response_cls.edit_message = edit_message
+    response_cls.defer = defer
+    response_cls.send_modal = send_modal
+
+async def respond(interaction, content=None, **kwargs):
+    """Responde pela resposta inicial ou por follow-up, conforme o caso
+
+    Retorna False se a interação já venceu.
+    """
+    try:
+        if interaction.response.is_done():
+            kwargs.pop('delete_after', None)
+            await interaction.followup.send(content, **kwargs)
+        else:
+            await interaction.response.send_message(content, **kwargs)
+        return True
+    except discord.HTTPException as e:
+        if not _is_expired(e):
+            raise
+        _stats['expired'] += 1
+        logger.warning(f"Interação {interaction.id} venceu antes da resposta: {e}")
+        return False
+
+def is_expired_error(error):
+    """Indica se um erro de comando foi causado por uma interação vencida"""
+    original = getattr(error, 'original', error)
+    if _is_expired(original):
+        _stats['expired'] += 1
+        return True
+    return False
+
+async def _start_stats_log():
+    if STATS_LOG_INTERVAL > 0 and not _log_stats.is_running():
+        _log_stats.start()
+
+def install(bot):
+    """Ativa o controle de prazo para todas as interações do bot"""
+    _wrap_response_methods()
+    bot.add_listener(_on_interaction, 'on_interaction')
+    bot.add_listener(_start_stats_log, 'on_ready')
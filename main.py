@@ -4,6 +4,8 @@ import logging
 from discord.ext import commands
 from discord import app_commands
 
+import interaction_deadline
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('ticket_bot')
@@ -22,6 +24,9 @@ intents.guilds = True
 
 bot = commands.Bot(command_prefix="!", intents=intents)
 
+# Confirma automaticamente as interações que não responderiam a tempo
+interaction_deadline.install(bot)
+
 # Discord bot token from environment variable
 TOKEN = os.getenv("DISCORD_BOT_TOKEN")
 if not TOKEN:
@@ -53,6 +58,12 @@ async def on_ready():
         print("- Ticket dropdowns loaded")
         await bot.load_extension("cogs.ticket_modals")
         print("- Ticket modals loaded")
+        await bot.load_extension("cogs.ticket_bulk")
+        print("- Ticket bulk operations loaded")
+        await bot.load_extension("cogs.ticket_pool")
+        print("- Ticket channel pool loaded")
+        await bot.load_extension("cogs.ticket_cold_storage")
+        print("- Ticket cold storage loaded")
         logger.info("All cogs loaded successfully")
         print("All cogs loaded successfully")
     except Exception as e:
@@ -95,13 +106,19 @@ async def on_guild_join(guild):
     from utils.db_manager import initialize_guild_config
     initialize_guild_config(guild.id)
 
-@bot.event
+# Erros dos comandos de barra passam pela árvore, não por eventos do bot
+@bot.tree.error
 async def on_app_command_error(interaction, error):
+    # A interação venceu: não há mais como responder ao usuário
+    if interaction_deadline.is_expired_error(error):
+        logger.warning(f"Interaction expired before responding: {error}")
+        return
+    
     if isinstance(error, app_commands.errors.MissingPermissions):
-        await interaction.response.send_message("Você não tem permissão para usar este comando!", ephemeral=True)
+        await interaction_deadline.respond(interaction, "Você não tem permissão para usar este comando!", ephemeral=True)
     else:
         logger.error(f"Command error: {error}")
-        await interaction.response.send_message(f"Ocorreu um erro ao executar o comando: {error}", ephemeral=True)
+        await interaction_deadline.respond(interaction, f"Ocorreu um erro ao executar o comando: {error}", ephemeral=True)
 
 if __name__ == "__main__":
     bot.run(TOKEN)
\ No newline at end of file
@@ -1,6 +1,17 @@
 import os
 import json
+import time
+import atexit
 import logging
+import threading
+from functools import wraps
+from collections import OrderedDict
+
+import snapshot
+import change_feed
+import ticket_search
+import ticket_archive
+from data_lock import data_lock, write_atomic
 
 # Configuração de logging
 logger = logging.getLogger('database')
@@ -9,6 +20,17 @@ logger = logging.getLogger('database')
 DATA_DIR = 'data'
 CONFIG_FILE = os.path.join(DATA_DIR, 'configs.json')
 EDIT_SESSIONS_FILE = os.path.join(DATA_DIR, 'edit_sessions.json')
+BULK_JOBS_FILE = os.path.join(DATA_DIR, 'bulk_jobs.json')
+CONFIG_SNAPSHOT_FILE = os.path.join(DATA_DIR, 'configs.snap')
+
+# Formato de armazenamento das configurações: 'json' ou 'snapshot'
+STORAGE_FORMAT = os.getenv('STORAGE_FORMAT', 'json')
+
+# Sessões de edição (mantidas em memória)
+EDIT_SESSION_TTL = int(os.getenv('EDIT_SESSION_TTL', 30 * 60))  # Em segundos
+EDIT_SESSION_MAX = int(os.getenv('EDIT_SESSION_MAX', 1000))
+EDIT_SESSION_SWEEP_INTERVAL = 60  # Em segundos
+EDIT_SESSION_SNAPSHOT = os.getenv('EDIT_SESSION_SNAPSHOT', '1') != '0'
 
 # Cria o diretório de dados se não existir
 os.makedirs(DATA_DIR, exist_ok=True)
@@ -28,13 +50,59 @@ def _load_json(file_path):
 def _save_json(file_path, data):
     """Salva dados em um arquivo JSON"""
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        with data_lock():
+            write_atomic(file_path, json.dumps(data, ensure_ascii=False, indent=4).encode('utf-8'))
         return True
     except Exception as e:
         logger.error(f"Erro ao salvar arquivo JSON {file_path}: {e}")
         return False
 
+# Acesso às configurações de um único servidor
+_config_lock = threading.RLock()
+_snapshot_reader = snapshot.SnapshotReader(CONFIG_SNAPSHOT_FILE)
+
+def _load_guild(guild_id):
+    """Carrega as configurações de um servidor (None se não existir)"""
+    if STORAGE_FORMAT == 'snapshot':
+        try:
+            return _snapshot_reader.get(guild_id)
+        except Exception as e:
+            logger.error(f"Erro ao carregar snapshot {CONFIG_SNAPSHOT_FILE}: {e}")
+            return None
+    
+    return _load_json(CONFIG_FILE).get(guild_id)
+
+def _save_guild(guild_id, guild_config):
+    """Salva as configurações de um servidor"""
+    with _config_lock:
+        if STORAGE_FORMAT == 'snapshot':
+            try:
+                with data_lock():
+                    snapshot.write_guild(_snapshot_reader, guild_id, guild_config)
+                return True
+            except Exception as e:
+                logger.error(f"Erro ao salvar snapshot {CONFIG_SNAPSHOT_FILE}: {e}")
+                return False
+        
+        configs = _load_json(CONFIG_FILE)
+        configs[guild_id] = guild_config
+        return _save_json(CONFIG_FILE, configs)
+
+def _guild_ids():
+    """Lista os servidores com configurações salvas"""
+    if STORAGE_FORMAT == 'snapshot':
+        return _snapshot_reader.guild_ids()
+    
+    return list(_load_json(CONFIG_FILE))
+
+def _atomic(func):
+    """Executa uma leitura-alteração-escrita sem intercalar com outras threads"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with _config_lock:
+            return func(*args, **kwargs)
+    return wrapper
+
 # Classes de modelo (agora apenas para definir a estrutura)
 class Guild:
     """Modelo para as configurações de cada servidor (guild)"""
@@ -52,36 +120,54 @@ class Guild:
             'auto_archive_tickets': False,
             'require_close_reason': True,
             'notify_on_open': False,
+            'cold_archive_after': 0,  # Em horas (0 = desativado)
             'ticket_format': "ticket-{number}",
+            'channel_pool_enabled': False,
+            'channel_pool_min': 1,
+            'channel_pool_max': 10,
+            'channel_pool': {},  # category_id -> [channel_id, ...]
             'panels': {},
             'tickets': {}
         }
     
     @staticmethod
+    @_atomic
     def get(guild_id):
         """Obtém as configurações de um servidor"""
-        configs = _load_json(CONFIG_FILE)
+        guild_config = _load_guild(guild_id)
         
-        if guild_id not in configs:
-            configs[guild_id] = Guild.get_default_config()
-            _save_json(CONFIG_FILE, configs)
+        if guild_config is None:
+            guild_config = Guild.get_default_config()
+            _save_guild(guild_id, guild_config)
             
-        return configs[guild_id]
+        return guild_config
     
     @staticmethod
+    @_atomic
     def update(guild_id, data):
         """Atualiza as configurações de um servidor"""
-        configs = _load_json(CONFIG_FILE)
-        
-        if guild_id not in configs:
-            configs[guild_id] = Guild.get_default_config()
+        with _config_lock:
+            guild_config = _load_guild(guild_id)
             
-        # Atualiza apenas os campos fornecidos
-        for key, value in data.items():
-            if key in configs[guild_id]:
-                configs[guild_id][key] = value
+            if guild_config is None:
+                guild_config = Guild.get_default_config()
+            
+            # Servidores criados antes de novas opções recebem os valores padrão
+            for key, value in Guild.get_default_config().items():
+                guild_config.setdefault(key, value)
                 
-        return _save_json(CONFIG_FILE, configs)
+            # Atualiza apenas os campos fornecidos
+            for key, value in data.items():
+                if key in guild_config:
+                    guild_config[key] = value
+            
+            if not _save_guild(guild_id, guild_config):
+                return False
+        
+        # Painéis e tickets publicam as suas próprias alterações
+        if set(data) - {'panels', 'tickets'}:
+            change_feed.publish(guild_id, 'config')
+        return True
 
 class Panel:
     """Modelo para os painéis de ticket de cada servidor"""
@@ -132,6 +218,7 @@ class Panel:
         return guild_config['panels']
     
     @staticmethod
+    @_atomic
     def create(guild_id, panel_id, panel_data=None):
         """Cria um novo painel para um servidor"""
         if panel_data is None:
@@ -143,9 +230,14 @@ class Panel:
             guild_config['panels'] = {}
         
         guild_config['panels'][panel_id] = panel_data
-        return Guild.update(guild_id, {'panels': guild_config['panels']})
+        if not Guild.update(guild_id, {'panels': guild_config['panels']}):
+            return False
+        
+        change_feed.publish(guild_id, 'panel', panel_id)
+        return True
     
     @staticmethod
+    @_atomic
     def update(guild_id, panel_id, panel_data):
         """Atualiza um painel existente"""
         guild_config = Guild.get(guild_id)
@@ -160,9 +252,14 @@ class Panel:
         for key, value in panel_data.items():
             guild_config['panels'][panel_id][key] = value
             
-        return Guild.update(guild_id, {'panels': guild_config['panels']})
+        if not Guild.update(guild_id, {'panels': guild_config['panels']}):
+            return False
+        
+        change_feed.publish(guild_id, 'panel', panel_id)
+        return True
     
     @staticmethod
+    @_atomic
     def delete(guild_id, panel_id):
         """Exclui um painel"""
         guild_config = Guild.get(guild_id)
@@ -171,7 +268,11 @@ class Panel:
             return False
         
         del guild_config['panels'][panel_id]
-        return Guild.update(guild_id, {'panels': guild_config['panels']})
+        if not Guild.update(guild_id, {'panels': guild_config['panels']}):
+            return False
+        
+        change_feed.publish(guild_id, 'panel', panel_id)
+        return True
 
 class Ticket:
     """Modelo para os tickets abertos em cada servidor"""
@@ -186,7 +287,9 @@ class Ticket:
             'ticket_type': None,
             'status': "open",  # open, closed, archived
             'claimed_by': None,
-            'priority': "none"  # none, low, medium, high
+            'priority': "none",  # none, low, medium, high
+            'created_at': None,  # Timestamp Unix
+            'closed_at': None  # Timestamp Unix
         }
     
     @staticmethod
@@ -199,13 +302,14 @@ class Ticket:
             Guild.update(guild_id, {'tickets': {}})
         
         if channel_id not in guild_config['tickets']:
-            return None
+            # Tickets antigos ficam no arquivo frio
+            return ticket_archive.get(guild_id, channel_id)
             
         return guild_config['tickets'][channel_id]
     
     @staticmethod
     def get_all(guild_id):
-        """Obtém todos os tickets de um servidor"""
+        """Obtém todos os tickets ativos de um servidor (sem o arquivo frio)"""
         guild_config = Guild.get(guild_id)
         
         if 'tickets' not in guild_config:
@@ -215,6 +319,7 @@ class Ticket:
         return guild_config['tickets']
     
     @staticmethod
+    @_atomic
     def create(guild_id, channel_id, ticket_data=None):
         """Cria um novo ticket para um servidor"""
         if ticket_data is None:
@@ -231,10 +336,19 @@ class Ticket:
             guild_config['next_ticket_number'] += 1
             Guild.update(guild_id, {'next_ticket_number': guild_config['next_ticket_number']})
         
+        if not ticket_data.get('created_at'):
+            ticket_data['created_at'] = int(time.time())
+        
         guild_config['tickets'][channel_id] = ticket_data
-        return Guild.update(guild_id, {'tickets': guild_config['tickets']})
+        if not Guild.update(guild_id, {'tickets': guild_config['tickets']}):
+            return False
+        
+        ticket_search.index_tickets(guild_id, {channel_id: ticket_data})
+        change_feed.publish(guild_id, 'ticket', channel_id)
+        return True
     
     @staticmethod
+    @_atomic
     def update(guild_id, channel_id, ticket_data):
         """Atualiza um ticket existente"""
         guild_config = Guild.get(guild_id)
@@ -242,25 +356,51 @@ class Ticket:
         if 'tickets' not in guild_config:
             guild_config['tickets'] = {}
         
+        restored = False
         if channel_id not in guild_config['tickets']:
-            return False
+            # Tickets do arquivo frio voltam ao registro ativo ao serem alterados
+            archived = ticket_archive.get(guild_id, channel_id)
+            if archived is None:
+                return False
+            guild_config['tickets'][channel_id] = archived
+            restored = True
         
         # Atualiza apenas os campos fornecidos
         for key, value in ticket_data.items():
             guild_config['tickets'][channel_id][key] = value
+        Ticket._stamp_closed(guild_config['tickets'][channel_id])
             
-        return Guild.update(guild_id, {'tickets': guild_config['tickets']})
+        if not Guild.update(guild_id, {'tickets': guild_config['tickets']}):
+            return False
+        
+        # Só sai do arquivo depois de gravado no registro ativo
+        if restored:
+            ticket_archive.remove(guild_id, [channel_id])
+        
+        ticket_search.index_tickets(guild_id, {channel_id: guild_config['tickets'][channel_id]})
+        change_feed.publish(guild_id, 'ticket', channel_id)
+        return True
     
     @staticmethod
+    @_atomic
     def delete(guild_id, channel_id):
         """Exclui um ticket"""
         guild_config = Guild.get(guild_id)
         
         if 'tickets' not in guild_config or channel_id not in guild_config['tickets']:
-            return False
-        
-        del guild_config['tickets'][channel_id]
-        return Guild.update(guild_id, {'tickets': guild_config['tickets']})
+            # Tickets do arquivo frio são retirados do índice do arquivo
+            if ticket_archive.get(guild_id, channel_id) is None:
+                return False
+            if not ticket_archive.remove(guild_id, [channel_id]):
+                return False
+        else:
+            del guild_config['tickets'][channel_id]
+            if not Guild.update(guild_id, {'tickets': guild_config['tickets']}):
+                return False
+        
+        ticket_search.remove_tickets(guild_id, [channel_id])
+        change_feed.publish(guild_id, 'ticket', channel_id)
+        return True
     
     @staticmethod
     def count_user_tickets(guild_id, user_id):
@@ -277,60 +417,373 @@ class Ticket:
                 
         return count
 
+    @staticmethod
+    def _stamp_closed(ticket):
+        """Registra quando o ticket deixou de estar aberto"""
+        if ticket.get('status') in ('closed', 'archived'):
+            if not ticket.get('closed_at'):
+                ticket['closed_at'] = int(time.time())
+        else:
+            ticket['closed_at'] = None
+    
+    @staticmethod
+    def get_by_number(guild_id, ticket_number):
+        """Obtém (channel_id, ticket) pelo número, incluindo o arquivo frio"""
+        for channel_id, ticket in Ticket.get_all(guild_id).items():
+            if ticket.get('ticket_number') == ticket_number:
+                return channel_id, ticket
+        
+        return ticket_archive.find_by_number(guild_id, ticket_number)
+    
+    @staticmethod
+    def get_archived(guild_id, offset=0, limit=50):
+        """Obtém uma página do histórico de tickets do arquivo frio"""
+        page = {}
+        for position, (channel_id, ticket) in enumerate(ticket_archive.iter_tickets(guild_id)):
+            if position < offset:
+                continue
+            if len(page) >= limit:
+                break
+            page[channel_id] = ticket
+            
+        return page
+    
+    @staticmethod
+    @_atomic
+    def archive_closed(guild_id, max_age=None):
+        """Move os tickets fechados há mais de max_age horas para o arquivo frio
+        
+        Usa a opção cold_archive_after do servidor quando max_age não é
+        informado. Retorna o número de tickets movidos.
+        """
+        guild_config = _load_guild(guild_id)
+        if guild_config is None:
+            return 0
+        
+        if max_age is None:
+            max_age = guild_config.get('cold_archive_after', 0)
+        if not max_age:
+            return 0
+        
+        now = time.time()
+        tickets = guild_config.get('tickets', {})
+        cold = {}
+        stamped = False
+        for channel_id, ticket in tickets.items():
+            if ticket.get('status') not in ('closed', 'archived'):
+                continue
+            
+            # Tickets fechados antes do registro de closed_at começam a contar agora
+            if not ticket.get('closed_at'):
+                ticket['closed_at'] = int(now)
+                stamped = True
+            if now - ticket['closed_at'] >= max_age * 3600:
+                cold[channel_id] = ticket
+        
+        # O segmento é gravado antes de remover os tickets do registro ativo
+        if cold and not ticket_archive.append(guild_id, cold):
+            return 0
+        
+        for channel_id in cold:
+            del tickets[channel_id]
+        
+        if not cold and not stamped:
+            return 0
+        if not _save_guild(guild_id, guild_config):
+            return 0
+        
+        if cold:
+            ticket_search.index_tickets(guild_id, cold, archived=True)
+            change_feed.publish(guild_id, 'ticket')
+            logger.info(f"{len(cold)} tickets do servidor {guild_id} movidos para o arquivo frio")
+        return len(cold)
+    
+    @staticmethod
+    def matches(ticket, status=None, panel_id=None, creator_id=None, older_than=None):
+        """Verifica se um ticket atende aos filtros de seleção
+        
+        older_than é a idade mínima em horas. Tickets sem data de criação
+        (anteriores ao registro de created_at) são considerados antigos.
+        """
+        if status is not None and ticket.get('status') != status:
+            return False
+        if panel_id is not None and str(ticket.get('panel_id')) != str(panel_id):
+            return False
+        if creator_id is not None and str(ticket.get('creator_id')) != str(creator_id):
+            return False
+        if older_than is not None:
+            created_at = ticket.get('created_at')
+            if created_at and time.time() - created_at < older_than * 3600:
+                return False
+        return True
+    
+    @staticmethod
+    def select(guild_id, **filters):
+        """Obtém os tickets de um servidor que atendem aos filtros"""
+        tickets = Ticket.get_all(guild_id)
+        
+        return {
+            channel_id: ticket for channel_id, ticket in tickets.items()
+            if Ticket.matches(ticket, **filters)
+        }
+    
+    @staticmethod
+    @_atomic
+    def bulk_update(guild_id, channel_ids, ticket_data):
+        """Atualiza vários tickets gravando o arquivo uma única vez"""
+        guild_config = _load_guild(guild_id) or {}
+        tickets = guild_config.get('tickets', {})
+        
+        updated = []
+        for channel_id in channel_ids:
+            if channel_id not in tickets:
+                continue
+            tickets[channel_id].update(ticket_data)
+            Ticket._stamp_closed(tickets[channel_id])
+            updated.append(channel_id)
+        
+        if not updated:
+            return []
+        if not _save_guild(guild_id, guild_config):
+            return []
+        
+        ticket_search.index_tickets(guild_id, {channel_id: tickets[channel_id] for channel_id in updated})
+        change_feed.publish(guild_id, 'ticket')
+        return updated
+    
+    @staticmethod
+    @_atomic
+    def bulk_delete(guild_id, channel_ids):
+        """Exclui vários tickets gravando o arquivo uma única vez"""
+        guild_config = _load_guild(guild_id) or {}
+        tickets = guild_config.get('tickets', {})
+        
+        deleted = []
+        for channel_id in channel_ids:
+            if tickets.pop(channel_id, None) is not None:
+                deleted.append(channel_id)
+        
+        if not deleted:
+            return []
+        if not _save_guild(guild_id, guild_config):
+            return []
+        
+        ticket_search.remove_tickets(guild_id, deleted)
+        change_feed.publish(guild_id, 'ticket')
+        return deleted
+
+class BulkJob:
+    """Modelo para as operações em massa pendentes sobre canais de ticket
+    
+    O job é gravado antes de os tickets serem alterados no armazenamento
+    (store_applied indica se isso já aconteceu) e guarda os canais que ainda
+    precisam ser processados no Discord, para que a operação possa continuar
+    após um reinício do bot.
+    """
+    
+    @staticmethod
+    @_atomic
+    def create(guild_id, job_data):
+        """Cria um novo job e retorna o seu identificador"""
+        jobs = _load_json(BULK_JOBS_FILE)
+        
+        job_id = f"{guild_id}:{int(time.time() * 1000)}"
+        jobs[job_id] = {
+            'guild_id': guild_id,
+            'action': None,  # close, archive, delete
+            'pending': [],
+            'store_applied': False,
+            'done': 0,
+            'failed': 0,
+            'total': 0,
+            'requested_by': None,
+            'progress_channel_id': None,
+            'progress_message_id': None,
+            'created_at': int(time.time()),
+            **job_data
+        }
+        
+        if not _save_json(BULK_JOBS_FILE, jobs):
+            return None
+        return job_id
+    
+    @staticmethod
+    def get(job_id):
+        """Obtém um job"""
+        return _load_json(BULK_JOBS_FILE).get(job_id)
+    
+    @staticmethod
+    def get_all():
+        """Obtém todos os jobs pendentes"""
+        return _load_json(BULK_JOBS_FILE)
+    
+    @staticmethod
+    @_atomic
+    def update(job_id, job_data):
+        """Atualiza o progresso de um job"""
+        jobs = _load_json(BULK_JOBS_FILE)
+        
+        if job_id not in jobs:
+            return False
+        
+        jobs[job_id].update(job_data)
+        return _save_json(BULK_JOBS_FILE, jobs)
+    
+    @staticmethod
+    @_atomic
+    def delete(job_id):
+        """Exclui um job concluído"""
+        jobs = _load_json(BULK_JOBS_FILE)
+        
+        if job_id not in jobs:
+            return False
+        
+        del jobs[job_id]
+        return _save_json(BULK_JOBS_FILE, jobs)
+
 class EditSession:
-    """Modelo para as sessões de edição de painéis"""
+    """Modelo para as sessões de edição de painéis
+
+    As sessões ficam em memória (LRU limitado com expiração por inatividade)
+    e só são gravadas em disco no encerramento do processo.
+    """
+    
+    _sessions = OrderedDict()
+    _lock = threading.RLock()
+    _last_sweep = 0.0
+    
+    @staticmethod
+    def _key(user_id, guild_id):
+        return f"{user_id}:{guild_id}"
+    
+    @classmethod
+    def _touch(cls, session_id, session):
+        """Marca a sessão como usada agora e a move para o fim da fila LRU"""
+        session['last_used'] = time.time()
+        cls._sessions[session_id] = session
+        cls._sessions.move_to_end(session_id)
+        
+        # Descarta as sessões menos usadas quando o limite é ultrapassado
+        while len(cls._sessions) > EDIT_SESSION_MAX:
+            cls._sessions.popitem(last=False)
+    
+    @classmethod
+    def sweep(cls, force=False):
+        """Remove as sessões inativas há mais de EDIT_SESSION_TTL segundos"""
+        now = time.time()
+        with cls._lock:
+            if not force and now - cls._last_sweep < EDIT_SESSION_SWEEP_INTERVAL:
+                return 0
+            cls._last_sweep = now
+            
+            expired = [
+                session_id for session_id, session in cls._sessions.items()
+                if now - session.get('last_used', 0) > EDIT_SESSION_TTL
+            ]
+            for session_id in expired:
+                del cls._sessions[session_id]
+                
+        if expired:
+            logger.info(f"{len(expired)} sessões de edição expiradas removidas")
+        return len(expired)
     
     @staticmethod
     def get(user_id, guild_id):
         """Obtém uma sessão de edição"""
-        session_id = f"{user_id}:{guild_id}"
-        sessions = _load_json(EDIT_SESSIONS_FILE)
+        EditSession.sweep()
+        session_id = EditSession._key(user_id, guild_id)
         
-        if session_id not in sessions:
-            return None
+        with EditSession._lock:
+            session = EditSession._sessions.get(session_id)
+            if session is None:
+                return None
+            
+            if time.time() - session.get('last_used', 0) > EDIT_SESSION_TTL:
+                del EditSession._sessions[session_id]
+                return None
             
-        return sessions[session_id]
+            EditSession._touch(session_id, session)
+            return {'panel_data': session['panel_data']}
     
     @staticmethod
     def create(user_id, guild_id, panel_data):
         """Cria uma nova sessão de edição"""
-        session_id = f"{user_id}:{guild_id}"
-        sessions = _load_json(EDIT_SESSIONS_FILE)
-        
-        sessions[session_id] = {
-            'panel_data': panel_data
-        }
+        EditSession.sweep()
+        session_id = EditSession._key(user_id, guild_id)
         
-        return _save_json(EDIT_SESSIONS_FILE, sessions)
+        with EditSession._lock:
+            EditSession._touch(session_id, {'panel_data': panel_data})
+            
+        return True
     
     @staticmethod
     def update(user_id, guild_id, panel_data):
         """Atualiza uma sessão de edição existente"""
-        session_id = f"{user_id}:{guild_id}"
-        sessions = _load_json(EDIT_SESSIONS_FILE)
+        session_id = EditSession._key(user_id, guild_id)
         
-        if session_id not in sessions:
-            sessions[session_id] = {}
+        with EditSession._lock:
+            session = EditSession._sessions.get(session_id, {})
+            session['panel_data'] = panel_data
+            EditSession._touch(session_id, session)
             
-        sessions[session_id]['panel_data'] = panel_data
-        
-        return _save_json(EDIT_SESSIONS_FILE, sessions)
+        return True
     
     @staticmethod
     def delete(user_id, guild_id):
         """Exclui uma sessão de edição"""
-        session_id = f"{user_id}:{guild_id}"
-        sessions = _load_json(EDIT_SESSIONS_FILE)
+        session_id = EditSession._key(user_id, guild_id)
         
-        if session_id not in sessions:
+        with EditSession._lock:
+            if session_id not in EditSession._sessions:
+                return False
+            
+            del EditSession._sessions[session_id]
+            return True
+    
+    @staticmethod
+    def load_snapshot():
+        """Carrega as sessões ainda válidas gravadas no último encerramento"""
+        sessions = _load_json(EDIT_SESSIONS_FILE)
+        now = time.time()
+        
+        with EditSession._lock:
+            # Ordena pelo último uso para reconstruir a ordem LRU
+            for session_id, session in sorted(sessions.items(), key=lambda item: item[1].get('last_used', 0)):
+                if 'panel_data' not in session:
+                    continue
+                if now - session.get('last_used', 0) > EDIT_SESSION_TTL:
+                    continue
+                EditSession._sessions[session_id] = session
+                
+            while len(EditSession._sessions) > EDIT_SESSION_MAX:
+                EditSession._sessions.popitem(last=False)
+                
+        return len(EditSession._sessions)
+    
+    @staticmethod
+    def save_snapshot():
+        """Grava as sessões ativas em disco (chamado no encerramento)"""
+        if not EDIT_SESSION_SNAPSHOT:
             return False
         
-        del sessions[session_id]
+        EditSession.sweep(force=True)
+        with EditSession._lock:
+            sessions = dict(EditSession._sessions)
+            
         return _save_json(EDIT_SESSIONS_FILE, sessions)
 
 # Inicializa os arquivos se não existirem
-if not os.path.exists(CONFIG_FILE):
+if STORAGE_FORMAT == 'snapshot':
+    if not os.path.exists(CONFIG_SNAPSHOT_FILE):
+        # Converte as configurações existentes na primeira execução
+        if os.path.exists(CONFIG_FILE):
+            snapshot.import_json(CONFIG_FILE, CONFIG_SNAPSHOT_FILE)
+        else:
+            snapshot.write(CONFIG_SNAPSHOT_FILE, {})
+elif not os.path.exists(CONFIG_FILE):
     _save_json(CONFIG_FILE, {})
     
-if not os.path.exists(EDIT_SESSIONS_FILE):
-    _save_json(EDIT_SESSIONS_FILE, {})
\ No newline at end of file
+# Restaura as sessões de edição do último encerramento e agenda a gravação
+if EDIT_SESSION_SNAPSHOT:
+    EditSession.load_snapshot()
+    atexit.register(EditSession.save_snapshot)
\ No newline at end of file
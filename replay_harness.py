@@ -0,0 +1,584 @@
+"""Harness local para testar a vazão do bot sem o Discord
+
+Carrega o ``commands.Bot`` real de main.py (com os seus cogs), substitui a
+camada HTTP e o gateway por simulações em memória e dispara sequências de
+interações (comandos, botões, menus, modais) com concorrência configurável.
+No final, mostra a latência de resposta e quantas operações de
+armazenamento e chamadas à API cada interação e cada ticket custaram.
+
+    python replay_harness.py script.json --sessions 200 --concurrency 20
+
+O script é uma lista de passos (ou {"steps": [...]}) executada por cada
+sessão, cada uma com o seu próprio usuário simulado:
+
+    [
+        {"button": "open_ticket:painel1"},
+        {"select": "ticket_reason", "values": ["compra"]},
+        {"modal": "close_ticket_modal", "fields": {"reason": "resolvido"}, "channel": "$channel"},
+        {"sleep": 0.1},
+        {"command": "tickets-em-massa", "options": {"acao": "close"}}
+    ]
+
+"$channel" é o último canal criado durante a sessão (ex.: o canal do
+ticket aberto), "$user" o usuário da sessão e "$guild" o servidor. Passos
+{"raw": {...}} reenviam payloads INTERACTION_CREATE gravados do gateway.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import itertools
+import threading
+import contextvars
+import statistics
+from datetime import datetime, timezone
+
+# Configuração de logging
+logger = logging.getLogger('replay_harness')
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+ACK_DEADLINE = 3.0
+
+# Interação em andamento (propagada para as tasks criadas pelo discord.py)
+_current = contextvars.ContextVar('replay_interaction', default=None)
+_snowflakes = itertools.count(1)
+
+def _snowflake():
+    # Timestamp atual nos bits altos, como os IDs reais
+    return str((int(time.time() * 1000) - 1420070400000) << 22 | next(_snowflakes) % (1 << 22))
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+class InteractionRecord:
+    """Métricas de uma interação disparada pelo harness"""
+
+    def __init__(self, session, kind):
+        self.session = session
+        self.kind = kind
+        self.id = _snowflake()
+        self.token = f"token-{self.id}"
+        self.started = time.perf_counter()
+        self.acked = None
+        self.last_activity = self.started
+        self.api_calls = 0
+        self.store_ops = 0
+
+    def touch(self):
+        self.last_activity = time.perf_counter()
+
+class Session:
+    """Usuário simulado executando o script"""
+
+    def __init__(self, harness, number):
+        self.harness = harness
+        self.number = number
+        self.user = harness.users[number % len(harness.users)]
+        self.channel_id = harness.lobby_channel_id
+        self.message_id = _snowflake()
+
+class FakeDiscord:
+    """Respostas simuladas para as rotas REST usadas pelo bot"""
+
+    def __init__(self, harness, api_latency, channel_create_interval):
+        self.harness = harness
+        self.api_latency = api_latency
+        self.channel_create_interval = channel_create_interval
+        self.next_channel_create = 0.0
+        self.calls = {}
+
+    def _record(self, method, path):
+        key = f"{method} {path}"
+        self.calls[key] = self.calls.get(key, 0) + 1
+
+        record = _current.get()
+        if record is not None:
+            record.api_calls += 1
+            record.touch()
+        return record
+
+    async def _delay(self, method, path):
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+
+        # Limite de criação de canais, que é o gargalo real ao abrir tickets
+        if method == 'POST' and path == '/guilds/{guild_id}/channels' and self.channel_create_interval:
+            now = time.monotonic()
+            wait = max(0.0, self.next_channel_create - now)
+            self.next_channel_create = max(now, self.next_channel_create) + self.channel_create_interval
+            if wait:
+                await asyncio.sleep(wait)
+
+    def message(self, channel_id, body=None):
+        body = body or {}
+        return {
+            'id': _snowflake(),
+            'channel_id': str(channel_id),
+            'guild_id': self.harness.guild_id,
+            'author': self.harness.bot_user,
+            'content': body.get('content') or '',
+            'timestamp': _now_iso(),
+            'edited_timestamp': None,
+            'tts': False,
+            'mention_everyone': False,
+            'mentions': [],
+            'mention_roles': [],
+            'attachments': [],
+            'embeds': body.get('embeds') or [],
+            'components': body.get('components') or [],
+            'pinned': False,
+            'type': 0,
+            'flags': body.get('flags') or 0
+        }
+
+    def channel(self, channel_id, body=None, base=None):
+        data = dict(base or {})
+        data.update({
+            'id': str(channel_id),
+            'guild_id': self.harness.guild_id,
+            'type': data.get('type', 0),
+            'position': data.get('position', 0),
+            'permission_overwrites': data.get('permission_overwrites', []),
+            'nsfw': False,
+            'rate_limit_per_user': 0,
+            'last_message_id': None
+        })
+        for key in ('name', 'type', 'parent_id', 'topic', 'permission_overwrites', 'position'):
+            if body and key in body:
+                data[key] = body[key]
+        data.setdefault('name', 'canal')
+        return data
+
+    async def request(self, route, **kwargs):
+        """Substitui discord.http.HTTPClient.request"""
+        method, path = route.method, route.path
+        record = self._record(method, path)
+        await self._delay(method, path)
+
+        body = kwargs.get('json')
+        if body is None and kwargs.get('form'):
+            # Mensagens com anexos chegam como multipart
+            for part in kwargs['form']:
+                if part.get('name') == 'payload_json':
+                    body = json.loads(part['value'])
+        state = self.harness.bot._connection
+
+        if path == '/users/@me':
+            return self.harness.bot_user
+        if path == '/oauth2/applications/@me':
+            return self.harness.application
+        if path.startswith('/applications/') and method == 'PUT':
+            return body or []
+        if path == '/guilds/{guild_id}/channels' and method == 'POST':
+            data = self.channel(_snowflake(), body)
+            self.harness.channels[data['id']] = data
+            # O gateway avisaria o bot sobre o novo canal
+            state.parse_channel_create(data)
+            session = record.session if record else None
+            if session is not None:
+                session.channel_id = data['id']
+            return data
+        if path == '/channels/{channel_id}':
+            current = self.harness.channels.get(str(route.channel_id))
+            data = self.channel(route.channel_id, body, current)
+            if method == 'PATCH':
+                self.harness.channels[data['id']] = data
+                state.parse_channel_update(data)
+            elif method == 'DELETE':
+                self.harness.channels.pop(data['id'], None)
+                state.parse_channel_delete(data)
+            return data
+        if path == '/channels/{channel_id}/permissions/{overwrite_id}':
+            return None
+        if path in ('/channels/{channel_id}/messages', '/channels/{channel_id}/messages/{message_id}'):
+            if method == 'DELETE':
+                return None
+            return self.message(route.channel_id, body)
+        if path == '/guilds/{guild_id}/members/{user_id}':
+            return self.harness.member_payload(self.harness.user_by_id(route.url.rsplit('/', 1)[-1]))
+
+        logger.debug(f"Rota sem simulação: {method} {path}")
+        return None
+
+    async def webhook_request(self, route, *args, payload=None, multipart=None, **kwargs):
+        """Substitui AsyncWebhookAdapter.request (respostas de interação)"""
+        method, path = route.method, route.path
+        record = self._record(method, path)
+        await self._delay(method, path)
+
+        if payload is None and multipart:
+            for part in multipart:
+                if part.get('name') == 'payload_json':
+                    payload = json.loads(part['value'])
+        payload = payload or {}
+
+        if path.endswith('/callback'):
+            if record is not None and record.acked is None:
+                record.acked = time.perf_counter()
+            return {
+                'interaction': {
+                    'id': str(route.webhook_id),
+                    'type': payload.get('type', 4),
+                    'response_message_loading': payload.get('type') == 5,
+                    'response_message_ephemeral': bool((payload.get('data') or {}).get('flags', 0) & 64)
+                }
+            }
+
+        if method == 'DELETE':
+            return None
+
+        channel_id = record.session.channel_id if record else self.harness.lobby_channel_id
+        return self.message(channel_id, payload)
+
+class ReplayHarness:
+    """Prepara o bot real com Discord simulado e executa os scripts"""
+
+    def __init__(self, users=50, api_latency=0.0, channel_create_interval=0.0, settle=0.05):
+        self.guild_id = _snowflake()
+        self.lobby_channel_id = _snowflake()
+        self.category_id = _snowflake()
+        self.settle = settle
+        self.records = []
+        self.channels = {}
+        self.bot = None
+        self.fake = FakeDiscord(self, api_latency, channel_create_interval)
+        self.store_ops = {}
+
+        self.bot_user = {'id': _snowflake(), 'username': 'HelpyBot', 'discriminator': '0', 'global_name': None, 'avatar': None, 'bot': True}
+        self.users = [
+            {'id': _snowflake(), 'username': f"usuario{n}", 'discriminator': '0', 'global_name': None, 'avatar': None}
+            for n in range(users)
+        ]
+        self.application = {
+            'id': self.bot_user['id'],
+            'name': 'HelpyBot',
+            'icon': None,
+            'description': '',
+            'bot_public': True,
+            'bot_require_code_grant': False,
+            'verify_key': '0' * 64,
+            'owner': self.users[0],
+            'flags': 0
+        }
+
+    def user_by_id(self, user_id):
+        for user in self.users:
+            if user['id'] == str(user_id):
+                return user
+        return self.users[0]
+
+    def member_payload(self, user, permissions='8'):
+        return {
+            'user': user,
+            'roles': [],
+            'joined_at': _now_iso(),
+            'deaf': False,
+            'mute': False,
+            'flags': 0,
+            'permissions': permissions
+        }
+
+    def _guild_payload(self):
+        lobby = {'id': self.lobby_channel_id, 'type': 0, 'name': 'geral', 'position': 0, 'permission_overwrites': [], 'parent_id': None}
+        category = {'id': self.category_id, 'type': 4, 'name': 'Tickets', 'position': 1, 'permission_overwrites': []}
+        self.channels = {lobby['id']: lobby, category['id']: category}
+
+        return {
+            'id': self.guild_id,
+            'name': 'Servidor simulado',
+            'owner_id': self.users[0]['id'],
+            'icon': None,
+            'features': [],
+            'emojis': [],
+            'stickers': [],
+            'roles': [{'id': self.guild_id, 'name': '@everyone', 'permissions': '0', 'position': 0, 'color': 0, 'hoist': False, 'managed': False, 'mentionable': False, 'flags': 0}],
+            'channels': [lobby, category],
+            'threads': [],
+            'members': [self.member_payload(self.bot_user)] + [self.member_payload(user) for user in self.users],
+            'member_count': len(self.users) + 1,
+            'voice_states': [],
+            'presences': [],
+            'large': False,
+            'premium_tier': 0,
+            'preferred_locale': 'pt-BR'
+        }
+
+    def _count_store_ops(self):
+        """Conta as leituras e escritas do armazenamento (models)
+
+        No formato JSON, _load_guild/_save_guild chamam _load_json/_save_json;
+        só a chamada mais externa é contada, para que os números sejam
+        comparáveis entre os formatos.
+        """
+        import models
+
+        depth = threading.local()
+
+        for name in ('_load_json', '_save_json', '_load_guild', '_save_guild'):
+            original = getattr(models, name)
+
+            def wrapper(*args, _original=original, _name=name, **kwargs):
+                level = getattr(depth, 'level', 0)
+                if level == 0:
+                    self.store_ops[_name] = self.store_ops.get(_name, 0) + 1
+                    record = _current.get()
+                    if record is not None:
+                        record.store_ops += 1
+                        record.touch()
+
+                depth.level = level + 1
+                try:
+                    return _original(*args, **kwargs)
+                finally:
+                    depth.level = level
+
+            setattr(models, name, wrapper)
+
+    async def start(self):
+        """Importa main.py e conecta o bot ao Discord simulado"""
+        from discord.webhook.async_ import AsyncWebhookAdapter
+
+        os.environ.setdefault('DISCORD_BOT_TOKEN', 'replay-harness')
+        sys.path.insert(0, REPO_DIR)
+        import main
+
+        self.bot = main.bot
+        self._count_store_ops()
+        self.bot.http.request = self.fake.request
+        fake = self.fake
+
+        async def webhook_request(adapter, route, *args, **kwargs):
+            return await fake.webhook_request(route, *args, **kwargs)
+
+        AsyncWebhookAdapter.request = webhook_request
+
+        await self.bot.login(os.environ['DISCORD_BOT_TOKEN'])
+
+        # Estado que o gateway entregaria no READY/GUILD_CREATE
+        state = self.bot._connection
+        state._add_guild_from_data(self._guild_payload())
+        self.bot._ready.set()
+
+        await main.on_ready()
+
+        # on_ready para no primeiro cog que falha; carrega os que ficaram de fora
+        for filename in sorted(os.listdir(os.path.join(REPO_DIR, 'cogs'))):
+            name = f"cogs.{filename[:-3]}"
+            if not filename.endswith('.py') or name in self.bot.extensions:
+                continue
+            try:
+                await self.bot.load_extension(name)
+            except Exception as e:
+                logger.warning(f"Não foi possível carregar {name}: {e}")
+
+    def _interaction_payload(self, session, record, interaction_type, data, channel_id=None, message=True):
+        channel_id = str(channel_id or session.channel_id)
+        channel = self.channels.get(channel_id) or {'id': channel_id, 'type': 0, 'name': 'ticket'}
+
+        payload = {
+            'id': record.id,
+            'application_id': self.application['id'],
+            'type': interaction_type,
+            'token': record.token,
+            'version': 1,
+            'guild_id': self.guild_id,
+            'channel_id': channel_id,
+            'channel': {**channel, 'guild_id': self.guild_id},
+            'member': self.member_payload(session.user),
+            'app_permissions': '8',
+            'locale': 'pt-BR',
+            'guild_locale': 'pt-BR',
+            'entitlements': [],
+            'authorizing_integration_owners': {},
+            'context': 0,
+            'data': data
+        }
+        if message:
+            payload['message'] = self.fake.message(channel_id)
+            payload['message']['id'] = session.message_id
+        return payload
+
+    def _build(self, session, record, step):
+        channel_id = step.get('channel')
+
+        if 'raw' in step:
+            payload = dict(step['raw'])
+            payload.update({'id': record.id, 'token': record.token, 'application_id': self.application['id'], 'guild_id': self.guild_id})
+            return payload
+
+        if 'command' in step:
+            options = []
+            for name, value in step.get('options', {}).items():
+                option_type = 5 if isinstance(value, bool) else 4 if isinstance(value, int) else 3
+                options.append({'name': name, 'type': option_type, 'value': value})
+            command = self.bot.tree.get_command(step['command'])
+            data = {'id': _snowflake(), 'name': step['command'], 'type': 1, 'options': options}
+            if command is None:
+                logger.warning(f"Comando {step['command']} não registrado na árvore")
+            return self._interaction_payload(session, record, 2, data, channel_id, message=False)
+
+        if 'button' in step:
+            data = {'custom_id': step['button'], 'component_type': 2}
+            return self._interaction_payload(session, record, 3, data, channel_id)
+
+        if 'select' in step:
+            data = {'custom_id': step['select'], 'component_type': 3, 'values': step.get('values', [])}
+            return self._interaction_payload(session, record, 3, data, channel_id)
+
+        if 'modal' in step:
+            components = [
+                {'type': 1, 'components': [{'type': 4, 'custom_id': field, 'value': value}]}
+                for field, value in step.get('fields', {}).items()
+            ]
+            data = {'custom_id': step['modal'], 'components': components}
+            return self._interaction_payload(session, record, 5, data, channel_id)
+
+        raise ValueError(f"Passo desconhecido: {step}")
+
+    def _substitute(self, value, session):
+        if isinstance(value, str):
+            return {
+                '$channel': session.channel_id,
+                '$user': session.user['id'],
+                '$guild': self.guild_id
+            }.get(value, value)
+        if isinstance(value, list):
+            return [self._substitute(item, session) for item in value]
+        if isinstance(value, dict):
+            return {key: self._substitute(item, session) for key, item in value.items()}
+        return value
+
+    async def _dispatch(self, session, step):
+        kind = next(key for key in ('raw', 'command', 'button', 'select', 'modal') if key in step)
+        record = InteractionRecord(session, kind)
+        payload = self._build(session, record, self._substitute(step, session))
+        self.records.append(record)
+
+        # Tasks criadas pelo discord.py herdam o contexto com a interação
+        token = _current.set(record)
+        try:
+            self.bot._connection.parse_interaction_create(payload)
+        finally:
+            _current.reset(token)
+
+        # Espera a confirmação e, depois, que as chamadas da interação cessem
+        while record.acked is None and time.perf_counter() - record.started < ACK_DEADLINE:
+            await asyncio.sleep(0.001)
+        while time.perf_counter() - record.last_activity < self.settle:
+            await asyncio.sleep(self.settle / 2)
+
+    async def _run_session(self, number, steps, semaphore):
+        async with semaphore:
+            session = Session(self, number)
+            for step in steps:
+                if 'sleep' in step:
+                    await asyncio.sleep(step['sleep'])
+                    continue
+                try:
+                    await self._dispatch(session, step)
+                except Exception as e:
+                    logger.error(f"Sessão {number}: erro no passo {step}: {e}")
+
+    async def run(self, steps, sessions=1, concurrency=1):
+        semaphore = asyncio.Semaphore(concurrency)
+        started = time.perf_counter()
+        await asyncio.gather(*(self._run_session(n, steps, semaphore) for n in range(sessions)))
+        return self.report(time.perf_counter() - started)
+
+    def report(self, elapsed):
+        import models
+        import interaction_deadline
+
+        def percentiles(values):
+            if not values:
+                return {}
+            values = sorted(values)
+            pick = lambda p: values[min(len(values) - 1, int(p * len(values)))]
+            return {
+                'p50_ms': round(pick(0.50) * 1000, 2),
+                'p95_ms': round(pick(0.95) * 1000, 2),
+                'p99_ms': round(pick(0.99) * 1000, 2),
+                'max_ms': round(values[-1] * 1000, 2),
+                'mean_ms': round(statistics.fmean(values) * 1000, 2)
+            }
+
+        acked = [r for r in self.records if r.acked is not None]
+        late = [r for r in acked if r.acked - r.started > ACK_DEADLINE]
+        tickets = len(models.Ticket.get_all(self.guild_id)) + models.ticket_archive.count(self.guild_id)
+        api_calls = sum(self.fake.calls.values())
+        store_ops = sum(self.store_ops.values())
+
+        return {
+            'interactions': len(self.records),
+            'elapsed_s': round(elapsed, 3),
+            'throughput_per_s': round(len(self.records) / elapsed, 2) if elapsed else None,
+            'ack_latency': percentiles([r.acked - r.started for r in acked]),
+            'completion_latency': percentiles([r.last_activity - r.started for r in self.records]),
+            'not_acked': len(self.records) - len(acked),
+            'acked_after_deadline': len(late),
+            'tickets': tickets,
+            'api_calls': api_calls,
+            'api_calls_per_ticket': round(api_calls / tickets, 2) if tickets else None,
+            'api_calls_by_route': dict(sorted(self.fake.calls.items(), key=lambda item: -item[1])),
+            'store_ops': self.store_ops,
+            'store_ops_per_ticket': round(store_ops / tickets, 2) if tickets else None,
+            'store_ops_per_interaction': round(store_ops / len(self.records), 2) if self.records else None,
+            'deadline': interaction_deadline.stats()
+        }
+
+def _load_steps(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.ndjson'):
+            return [json.loads(line) for line in f if line.strip()]
+        data = json.load(f)
+    return data['steps'] if isinstance(data, dict) else data
+
+async def _main(args):
+    harness = ReplayHarness(
+        users=args.users,
+        api_latency=args.api_latency / 1000,
+        channel_create_interval=args.channel_create_interval / 1000,
+        settle=args.settle / 1000
+    )
+    await harness.start()
+    report = await harness.run(_load_steps(args.script), sessions=args.sessions, concurrency=args.concurrency)
+    await harness.bot.close()
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Executa interações simuladas contra o bot real")
+    parser.add_argument('script', help="Arquivo JSON/NDJSON com os passos de cada sessão")
+    parser.add_argument('--sessions', type=int, default=1, help="Quantidade de sessões (usuários) a executar")
+    parser.add_argument('--concurrency', type=int, default=1, help="Sessões executadas ao mesmo tempo")
+    parser.add_argument('--users', type=int, default=50, help="Usuários distintos no servidor simulado")
+    parser.add_argument('--api-latency', type=float, default=0, help="Latência simulada de cada chamada à API (ms)")
+    parser.add_argument('--channel-create-interval', type=float, default=0, help="Intervalo mínimo entre criações de canal (ms)")
+    parser.add_argument('--settle', type=float, default=50, help="Tempo sem chamadas para considerar a interação concluída (ms)")
+    parser.add_argument('--data-dir', help="Diretório de trabalho (padrão: temporário, os dados reais não são tocados)")
+    parser.add_argument('--output', help="Grava o relatório em JSON neste arquivo")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args.script = os.path.abspath(args.script)
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    # Os modelos usam 'data/' relativo ao diretório atual
+    if args.data_dir:
+        os.makedirs(args.data_dir, exist_ok=True)
+    os.chdir(args.data_dir or tempfile.mkdtemp(prefix='helpybot-replay-'))
+
+    report = asyncio.run(_main(args))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
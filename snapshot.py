@@ -0,0 +1,288 @@
+"""Formato binário compacto para as configurações dos servidores
+
+Layout do arquivo:
+
+    MAGIC (8 bytes) | offset do índice (uint64) | tamanho do índice (uint64)
+    blocos de cada servidor (JSON compacto, concatenados)
+    índice (JSON: guild_id -> [offset, tamanho])
+
+O arquivo é mapeado em memória e cada servidor só é decodificado quando
+acessado. Gravar um servidor acrescenta o seu bloco e um novo índice no fim
+do arquivo e só então troca o cabeçalho; os blocos e índices antigos viram
+espaço morto, compactado em segundo plano. Uso como ferramenta:
+
+    python snapshot.py export data/configs.snap configs.json
+    python snapshot.py import configs.json data/configs.snap
+"""
+import os
+import sys
+import json
+import mmap
+import struct
+import logging
+import argparse
+import threading
+
+# Configuração de logging
+logger = logging.getLogger('snapshot')
+
+MAGIC = b'HBSNAP1\0'
+HEADER = struct.Struct('<QQ')
+HEADER_SIZE = len(MAGIC) + HEADER.size
+
+# Compacta quando o espaço morto passa deste tamanho e do espaço útil
+COMPACT_MIN_BYTES = int(os.getenv('SNAPSHOT_COMPACT_MIN_BYTES', 1024 * 1024))
+
+# Usa orjson quando disponível; o resultado continua sendo JSON comum
+try:
+    import orjson
+
+    def dumps(data):
+        return orjson.dumps(data)
+
+    loads = orjson.loads
+except ImportError:
+    def dumps(data):
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    loads = json.loads
+
+def read_header(path):
+    """Lê (offset, tamanho) do índice atual de um snapshot"""
+    with open(path, 'rb') as f:
+        data = f.read(HEADER_SIZE)
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} não é um snapshot válido")
+    return HEADER.unpack_from(data, len(MAGIC))
+
+class SnapshotReader:
+    """Leitura preguiçosa de um snapshot mapeado em memória
+
+    header fixa o índice lido, ignorando gravações feitas depois (usado pelo
+    backup, que lê uma cópia do arquivo enquanto o bot continua gravando).
+    """
+
+    def __init__(self, path, header=None):
+        self.path = path
+        self.header = header
+        self.file = None
+        self.map = None
+        self.index = {}
+        self.stat_key = None
+        self.lock = threading.Lock()
+        self.compacting = False
+
+    def _refresh(self):
+        """Remapeia o arquivo se ele foi substituído desde a última leitura"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self.close()
+            self.stat_key = None
+            return
+
+        stat_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stat_key == self.stat_key:
+            return
+
+        self.close()
+        self.file = open(self.path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} não é um snapshot válido")
+
+        index_offset, index_length = self.header or HEADER.unpack_from(self.map, len(MAGIC))
+        self.index = loads(self.map[index_offset:index_offset + index_length])
+        self.stat_key = stat_key
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.index = {}
+
+    def guild_ids(self):
+        with self.lock:
+            self._refresh()
+            return list(self.index)
+
+    def raw(self, guild_id):
+        """Obtém os bytes codificados de um servidor, sem decodificá-los"""
+        with self.lock:
+            self._refresh()
+            entry = self.index.get(guild_id)
+            if entry is None:
+                return None
+            offset, length = entry
+            return bytes(self.map[offset:offset + length])
+
+    def get(self, guild_id):
+        """Decodifica apenas o servidor pedido"""
+        data = self.raw(guild_id)
+        return loads(data) if data is not None else None
+
+    def raw_all(self):
+        """Obtém os bytes codificados de todos os servidores"""
+        with self.lock:
+            self._refresh()
+            return {
+                guild_id: bytes(self.map[offset:offset + length])
+                for guild_id, (offset, length) in self.index.items()
+            }
+
+def write(path, blobs):
+    """Grava um snapshot a partir de {guild_id: bytes codificados}"""
+    index = {}
+    offset = HEADER_SIZE
+    for guild_id, blob in blobs.items():
+        index[guild_id] = [offset, len(blob)]
+        offset += len(blob)
+    index_data = dumps(index)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(HEADER.pack(offset, len(index_data)))
+        for blob in blobs.values():
+            f.write(blob)
+        f.write(index_data)
+    os.replace(tmp_path, path)
+
+def write_guild(reader, guild_id, data):
+    """Grava um servidor sem regravar o snapshot
+
+    Acrescenta o bloco do servidor e um novo índice no fim do arquivo e
+    depois troca o cabeçalho, então o custo depende só do servidor gravado.
+    Leitores continuam vendo o índice anterior até a troca do cabeçalho.
+    """
+    with reader.lock:
+        reader._refresh()
+        if reader.map is None:
+            write(reader.path, {} if data is None else {guild_id: dumps(data)})
+            return
+
+        index = dict(reader.index)
+        with open(reader.path, 'r+b') as f:
+            end = f.seek(0, os.SEEK_END)
+            if data is None:
+                index.pop(guild_id, None)
+            else:
+                blob = dumps(data)
+                f.write(blob)
+                index[guild_id] = [end, len(blob)]
+                end += len(blob)
+
+            index_data = dumps(index)
+            f.write(index_data)
+            # Os dados precisam estar no disco antes do cabeçalho apontar para eles
+            f.flush()
+            os.fsync(f.fileno())
+
+            f.seek(len(MAGIC))
+            f.write(HEADER.pack(end, len(index_data)))
+
+        live = HEADER_SIZE + sum(length for _, length in index.values()) + len(index_data)
+        dead = end + len(index_data) - live
+
+    if dead >= COMPACT_MIN_BYTES and dead > live:
+        _schedule_compaction(reader)
+
+def _schedule_compaction(reader):
+    with reader.lock:
+        if reader.compacting:
+            return
+        reader.compacting = True
+    threading.Thread(target=compact, args=(reader,), name='snapshot-compact', daemon=True).start()
+
+def compact(reader):
+    """Regrava o snapshot sem o espaço morto
+
+    A cópia é feita sem segurar o leitor; se o arquivo mudar no meio, o
+    resultado é descartado e a compactação fica para a próxima gravação.
+    """
+    tmp_path = f"{reader.path}.compact.tmp"
+    try:
+        with open(reader.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as source:
+            stat = os.fstat(f.fileno())
+            stat_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            index_offset, index_length = HEADER.unpack_from(source, len(MAGIC))
+            old_index = loads(source[index_offset:index_offset + index_length])
+
+            index = {}
+            offset = HEADER_SIZE
+            for guild_id, (_, length) in old_index.items():
+                index[guild_id] = [offset, length]
+                offset += length
+            index_data = dumps(index)
+
+            with open(tmp_path, 'wb') as out:
+                out.write(MAGIC)
+                out.write(HEADER.pack(offset, len(index_data)))
+                for start, length in old_index.values():
+                    out.write(source[start:start + length])
+                out.write(index_data)
+
+        with reader.lock:
+            stat = os.stat(reader.path)
+            if (stat.st_ino, stat.st_mtime_ns, stat.st_size) != stat_key:
+                os.remove(tmp_path)
+                return
+            os.replace(tmp_path, reader.path)
+
+        logger.info(f"Snapshot {reader.path} compactado: {stat_key[2]} -> {offset + len(index_data)} bytes")
+    except Exception as e:
+        logger.error(f"Erro ao compactar snapshot {reader.path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    finally:
+        with reader.lock:
+            reader.compacting = False
+
+def export_json(snapshot_path, json_path):
+    """Exporta um snapshot para JSON legível"""
+    reader = SnapshotReader(snapshot_path)
+    data = {guild_id: reader.get(guild_id) for guild_id in reader.guild_ids()}
+    reader.close()
+
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+    return len(data)
+
+def import_json(json_path, snapshot_path):
+    """Converte um arquivo JSON de configurações em snapshot"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    write(snapshot_path, {guild_id: dumps(config) for guild_id, config in data.items()})
+    return len(data)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Converte snapshots de configuração de/para JSON")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help="snapshot -> JSON legível")
+    export_parser.add_argument('snapshot')
+    export_parser.add_argument('json')
+
+    import_parser = subparsers.add_parser('import', help="JSON -> snapshot")
+    import_parser.add_argument('json')
+    import_parser.add_argument('snapshot')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        count = export_json(args.snapshot, args.json)
+    else:
+        count = import_json(args.json, args.snapshot)
+
+    print(f"{count} servidores convertidos")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+import os
+import gzip
+import json
+import time
+import logging
+import threading
+from functools import lru_cache
+
+from data_lock import data_lock, write_atomic
+
+# Configuração de logging
+logger = logging.getLogger('ticket_archive')
+
+# Arquivo frio de tickets fechados: data/archive/<guild_id>/
+ARCHIVE_DIR = os.path.join('data', 'archive')
+INDEX_FILE = 'index.json'
+
+_lock = threading.Lock()
+
+def _guild_dir(guild_id, archive_dir=None):
+    return os.path.join(archive_dir or ARCHIVE_DIR, str(guild_id))
+
+def load_index(guild_id, archive_dir=None):
+    """Carrega o índice do arquivo de um servidor (cópia própria, para alterar)
+
+    channels: channel_id -> segmento; numbers: ticket_number -> channel_id
+    """
+    index_path = os.path.join(_guild_dir(guild_id, archive_dir), INDEX_FILE)
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'channels': {}, 'numbers': {}, 'segments': []}
+    except Exception as e:
+        logger.error(f"Erro ao carregar índice do arquivo {index_path}: {e}")
+        return {'channels': {}, 'numbers': {}, 'segments': []}
+
+@lru_cache(maxsize=64)
+def _read_index(index_path, stat_key):
+    """Decodifica um índice (cacheado enquanto o arquivo não mudar)"""
+    with open(index_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _cached_index(guild_id, archive_dir=None):
+    """Índice somente leitura, sem reler o disco a cada consulta"""
+    index_path = os.path.join(_guild_dir(guild_id, archive_dir), INDEX_FILE)
+    try:
+        stat = os.stat(index_path)
+        return _read_index(index_path, (stat.st_ino, stat.st_mtime_ns, stat.st_size))
+    except FileNotFoundError:
+        return {'channels': {}, 'numbers': {}, 'segments': []}
+    except Exception as e:
+        logger.error(f"Erro ao carregar índice do arquivo {index_path}: {e}")
+        return {'channels': {}, 'numbers': {}, 'segments': []}
+
+@lru_cache(maxsize=16)
+def _read_segment(segment_path, mtime):
+    """Decodifica um segmento (cacheado enquanto o arquivo não mudar)"""
+    tickets = {}
+    with gzip.open(segment_path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                tickets[record['channel_id']] = record['ticket']
+    return tickets
+
+def read_segment(guild_id, segment, archive_dir=None):
+    segment_path = os.path.join(_guild_dir(guild_id, archive_dir), segment)
+    try:
+        return _read_segment(segment_path, os.path.getmtime(segment_path))
+    except FileNotFoundError:
+        return {}
+
+def append(guild_id, tickets):
+    """Grava tickets em um novo segmento comprimido e atualiza o índice"""
+    if not tickets:
+        return True
+
+    guild_dir = _guild_dir(guild_id)
+    os.makedirs(guild_dir, exist_ok=True)
+
+    with _lock, data_lock():
+        index = load_index(guild_id)
+        segment = f"segment-{int(time.time() * 1000)}.ndjson.gz"
+
+        lines = ''.join(
+            json.dumps({'channel_id': channel_id, 'ticket': ticket}, ensure_ascii=False) + '\n'
+            for channel_id, ticket in tickets.items()
+        )
+
+        try:
+            write_atomic(os.path.join(guild_dir, segment), gzip.compress(lines.encode('utf-8')))
+
+            index['segments'].append(segment)
+            for channel_id, ticket in tickets.items():
+                index['channels'][channel_id] = segment
+                if ticket.get('ticket_number'):
+                    index['numbers'][str(ticket['ticket_number'])] = channel_id
+
+            write_atomic(os.path.join(guild_dir, INDEX_FILE), json.dumps(index, ensure_ascii=False).encode('utf-8'))
+        except Exception as e:
+            logger.error(f"Erro ao arquivar tickets do servidor {guild_id}: {e}")
+            return False
+
+    return True
+
+def remove(guild_id, channel_ids):
+    """Retira tickets do índice (por exemplo, ao voltarem ao registro ativo)
+
+    As linhas continuam nos segmentos, mas deixam de valer para a leitura.
+    """
+    channel_ids = {str(channel_id) for channel_id in channel_ids}
+    guild_dir = _guild_dir(guild_id)
+
+    with _lock, data_lock():
+        index = load_index(guild_id)
+        removed = channel_ids & set(index['channels'])
+        if not removed:
+            return True
+
+        for channel_id in removed:
+            del index['channels'][channel_id]
+        index['numbers'] = {
+            number: channel_id for number, channel_id in index['numbers'].items()
+            if channel_id not in removed
+        }
+
+        try:
+            write_atomic(os.path.join(guild_dir, INDEX_FILE), json.dumps(index, ensure_ascii=False).encode('utf-8'))
+        except Exception as e:
+            logger.error(f"Erro ao atualizar o índice do arquivo do servidor {guild_id}: {e}")
+            return False
+
+    return True
+
+def get(guild_id, channel_id):
+    """Obtém um ticket arquivado, lendo apenas o seu segmento"""
+    segment = _cached_index(guild_id)['channels'].get(str(channel_id))
+    if segment is None:
+        return None
+    return read_segment(guild_id, segment).get(str(channel_id))
+
+def find_by_number(guild_id, ticket_number):
+    """Obtém (channel_id, ticket) de um ticket arquivado pelo número"""
+    channel_id = _cached_index(guild_id)['numbers'].get(str(ticket_number))
+    if channel_id is None:
+        return None, None
+    return channel_id, get(guild_id, channel_id)
+
+def count(guild_id):
+    return len(_cached_index(guild_id)['channels'])
+
+def iter_tickets(guild_id, newest_first=True, archive_dir=None):
+    """Percorre os tickets arquivados segmento a segmento
+
+    archive_dir permite ler uma cópia do arquivo (por exemplo, a do backup).
+    """
+    index = _cached_index(guild_id, archive_dir)
+    segments = reversed(index['segments']) if newest_first else index['segments']
+
+    for segment in segments:
+        for channel_id, ticket in read_segment(guild_id, segment, archive_dir).items():
+            # Um ticket arquivado duas vezes vale apenas no segmento mais novo
+            if index['channels'].get(channel_id) == segment:
+                yield channel_id, ticket
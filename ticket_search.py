@@ -0,0 +1,277 @@
+"""Índice de busca de tickets (SQLite com FTS5)
+
+Mantido de forma incremental pelos modelos a cada alteração de ticket e
+consultado pelo painel de administração. Se o índice ainda não foi montado
+(banco novo ou apagado), a primeira busca o recria. Para recriá-lo à mão:
+
+    python ticket_search.py rebuild
+"""
+import os
+import sys
+import json
+import sqlite3
+import logging
+import threading
+
+# Configuração de logging
+logger = logging.getLogger('ticket_search')
+
+SEARCH_DB = os.path.join('data', 'search.db')
+
+# Campos indexados com coluna própria (os demais ficam só no texto livre)
+FIELDS = ('ticket_number', 'creator_id', 'claimed_by', 'priority', 'status', 'panel_id', 'ticket_type', 'created_at', 'closed_at')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    id INTEGER PRIMARY KEY,
+    guild_id TEXT NOT NULL,
+    channel_id TEXT NOT NULL,
+    ticket_number INTEGER,
+    creator_id TEXT,
+    claimed_by TEXT,
+    priority TEXT,
+    status TEXT,
+    panel_id TEXT,
+    ticket_type TEXT,
+    created_at INTEGER,
+    closed_at INTEGER,
+    archived INTEGER NOT NULL DEFAULT 0,
+    body TEXT,
+    data TEXT NOT NULL,
+    UNIQUE (guild_id, channel_id)
+);
+CREATE INDEX IF NOT EXISTS idx_tickets_created ON tickets (guild_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_tickets_number ON tickets (guild_id, ticket_number);
+CREATE INDEX IF NOT EXISTS idx_tickets_creator ON tickets (guild_id, creator_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_tickets_claimer ON tickets (guild_id, claimed_by, created_at);
+CREATE INDEX IF NOT EXISTS idx_tickets_priority ON tickets (guild_id, priority, created_at);
+CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets (guild_id, status, created_at);
+CREATE INDEX IF NOT EXISTS idx_tickets_panel ON tickets (guild_id, panel_id, created_at);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS tickets_fts USING fts5(body, content='tickets', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS tickets_ai AFTER INSERT ON tickets BEGIN
+    INSERT INTO tickets_fts (rowid, body) VALUES (new.id, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS tickets_ad AFTER DELETE ON tickets BEGIN
+    INSERT INTO tickets_fts (tickets_fts, rowid, body) VALUES ('delete', old.id, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS tickets_au AFTER UPDATE ON tickets BEGIN
+    INSERT INTO tickets_fts (tickets_fts, rowid, body) VALUES ('delete', old.id, old.body);
+    INSERT INTO tickets_fts (rowid, body) VALUES (new.id, new.body);
+END;
+"""
+
+# Marca (PRAGMA user_version) de que o índice foi montado por completo
+INDEX_VERSION = 1
+
+_local = threading.local()
+_build_lock = threading.Lock()
+_built = False
+
+def _connection():
+    """Conexão SQLite por thread (o bot e o painel escrevem em paralelo)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        os.makedirs(os.path.dirname(SEARCH_DB), exist_ok=True)
+        conn = sqlite3.connect(SEARCH_DB, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        _local.conn = conn
+    return conn
+
+def _text(value):
+    return str(value) if value is not None else None
+
+def _row(guild_id, channel_id, ticket, archived):
+    # Texto livre: todos os valores textuais do ticket (motivo, tipo, ...)
+    body = ' '.join(str(value) for value in ticket.values() if isinstance(value, (str, int)) and not isinstance(value, bool))
+    return (
+        str(guild_id),
+        str(channel_id),
+        ticket.get('ticket_number'),
+        _text(ticket.get('creator_id')),
+        _text(ticket.get('claimed_by')),
+        ticket.get('priority'),
+        ticket.get('status'),
+        _text(ticket.get('panel_id')),
+        ticket.get('ticket_type'),
+        ticket.get('created_at'),
+        ticket.get('closed_at'),
+        1 if archived else 0,
+        body,
+        json.dumps(ticket, ensure_ascii=False)
+    )
+
+def index_tickets(guild_id, tickets, archived=False):
+    """Insere ou atualiza tickets no índice ({channel_id: ticket})"""
+    if not tickets:
+        return True
+
+    try:
+        conn = _connection()
+        with conn:
+            conn.executemany(
+                """
+                INSERT INTO tickets (guild_id, channel_id, ticket_number, creator_id, claimed_by, priority,
+                                     status, panel_id, ticket_type, created_at, closed_at, archived, body, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (guild_id, channel_id) DO UPDATE SET
+                    ticket_number = excluded.ticket_number,
+                    creator_id = excluded.creator_id,
+                    claimed_by = excluded.claimed_by,
+                    priority = excluded.priority,
+                    status = excluded.status,
+                    panel_id = excluded.panel_id,
+                    ticket_type = excluded.ticket_type,
+                    created_at = excluded.created_at,
+                    closed_at = excluded.closed_at,
+                    archived = excluded.archived,
+                    body = excluded.body,
+                    data = excluded.data
+                """,
+                [_row(guild_id, channel_id, ticket, archived) for channel_id, ticket in tickets.items()]
+            )
+        return True
+    except Exception as e:
+        # O índice pode ser recriado; uma falha aqui não deve impedir a escrita
+        logger.error(f"Erro ao indexar tickets do servidor {guild_id}: {e}")
+        return False
+
+def remove_tickets(guild_id, channel_ids):
+    """Remove tickets do índice"""
+    if not channel_ids:
+        return True
+
+    try:
+        conn = _connection()
+        with conn:
+            conn.executemany(
+                "DELETE FROM tickets WHERE guild_id = ? AND channel_id = ?",
+                [(str(guild_id), str(channel_id)) for channel_id in channel_ids]
+            )
+        return True
+    except Exception as e:
+        logger.error(f"Erro ao remover tickets do índice do servidor {guild_id}: {e}")
+        return False
+
+def search(guild_id, query=None, page=1, per_page=50, since=None, until=None, **filters):
+    """Busca tickets de um servidor, do mais novo para o mais antigo
+
+    filters aceita os campos de FIELDS (comparação exata); since/until
+    limitam created_at (timestamps Unix). Retorna (tickets, has_more).
+    """
+    conditions = ["t.guild_id = ?"]
+    params = [str(guild_id)]
+
+    for field, value in filters.items():
+        if field not in FIELDS:
+            raise ValueError(f"Campo de busca inválido: {field}")
+        if value is None or value == '':
+            continue
+        conditions.append(f"t.{field} = ?")
+        params.append(value)
+
+    if since is not None:
+        conditions.append("t.created_at >= ?")
+        params.append(since)
+    if until is not None:
+        conditions.append("t.created_at < ?")
+        params.append(until)
+
+    source = "tickets t"
+    if query:
+        source = "tickets_fts f JOIN tickets t ON t.id = f.rowid"
+        conditions.append("tickets_fts MATCH ?")
+        # Cada termo é buscado como prefixo literal
+        params.append(' '.join('"' + term.replace('"', '""') + '"*' for term in query.split()))
+
+    # Uma linha a mais indica se existe uma próxima página, sem COUNT(*)
+    sql = (
+        f"SELECT t.channel_id, t.archived, t.data FROM {source} "
+        f"WHERE {' AND '.join(conditions)} "
+        "ORDER BY t.created_at DESC, t.id DESC LIMIT ? OFFSET ?"
+    )
+    params.extend([per_page + 1, (page - 1) * per_page])
+
+    ensure_built()
+    rows = _connection().execute(sql, params).fetchall()
+    tickets = [
+        {'channel_id': row['channel_id'], 'archived': bool(row['archived']), **json.loads(row['data'])}
+        for row in rows[:per_page]
+    ]
+    return tickets, len(rows) > per_page
+
+def _dashboard_tickets(tickets_dir, guild_id):
+    """Tickets gravados pelo painel (data/tickets/<servidor>/<canal>.json)"""
+    guild_dir = os.path.join(tickets_dir, guild_id)
+    tickets = {}
+    for filename in sorted(os.listdir(guild_dir)) if os.path.isdir(guild_dir) else []:
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(guild_dir, filename), 'r', encoding='utf-8') as f:
+                tickets[filename[:-len('.json')]] = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Erro ao ler o ticket {filename} do servidor {guild_id}: {e}")
+    return tickets
+
+def rebuild():
+    """Recria o índice a partir do armazenamento, do arquivo frio e do painel"""
+    import models
+    import ticket_archive
+
+    tickets_dir = os.path.join(models.DATA_DIR, 'tickets')
+
+    conn = _connection()
+    with conn:
+        conn.execute("DELETE FROM tickets")
+
+    guild_ids = set(models._guild_ids())
+    for folder in (ticket_archive.ARCHIVE_DIR, tickets_dir):
+        if os.path.isdir(folder):
+            guild_ids.update(os.listdir(folder))
+
+    count = 0
+    for guild_id in sorted(guild_ids):
+        tickets = (models._load_guild(guild_id) or {}).get('tickets', {})
+        archived = dict(ticket_archive.iter_tickets(guild_id, newest_first=False))
+        # A cópia do painel só vale para tickets que o bot e o arquivo frio não têm
+        dashboard = {
+            channel_id: ticket
+            for channel_id, ticket in _dashboard_tickets(tickets_dir, guild_id).items()
+            if channel_id not in tickets and channel_id not in archived
+        }
+        index_tickets(guild_id, dashboard)
+        index_tickets(guild_id, archived, archived=True)
+        index_tickets(guild_id, tickets)
+        count += len(tickets) + len(archived) + len(dashboard)
+
+    with conn:
+        conn.execute("INSERT INTO tickets_fts (tickets_fts) VALUES ('optimize')")
+        conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+
+    logger.info(f"Índice de busca recriado com {count} tickets")
+    return count
+
+def ensure_built():
+    """Monta o índice se ele nunca foi montado (banco novo, apagado ou antigo)"""
+    global _built
+    if _built:
+        return
+
+    with _build_lock:
+        if _built:
+            return
+        version = _connection().execute("PRAGMA user_version").fetchone()[0]
+        if version < INDEX_VERSION:
+            logger.info("Índice de busca ausente, recriando a partir dos dados salvos")
+            rebuild()
+        _built = True
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['rebuild']:
+        print("Uso: python ticket_search.py rebuild")
+        sys.exit(1)
+    print(f"{rebuild()} tickets indexados")